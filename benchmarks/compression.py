@@ -0,0 +1,82 @@
+import os
+import random
+import sqlite3
+import tempfile
+from argparse import ArgumentParser
+
+from alembic import command
+from alembic.config import Config
+from webapp.commands import migrate
+from webapp.models import engines
+from webapp.repositories import AppDatabase
+
+
+UNCOMPRESSED = "c1839631a539"
+
+
+def make_code(rng: random.Random, task: int) -> str:
+    lines = [f"def main(x{task}):"]
+    for index in range(rng.randint(5, 60)):
+        lines.append(f"    value_{index} = x{task} * {rng.randint(0, 1000)} + {rng.random():.6f}")
+        if rng.random() < 0.3:
+            lines.append(f"    if value_{index} > {rng.randint(0, 100)}:\n        return value_{index}")
+    lines.append("    return None")
+    return "\n".join(lines)
+
+
+def make_output(rng: random.Random) -> str | None:
+    if rng.random() < 0.5:
+        return None
+    frames = "".join(f'  File "/core/checker/tests_{rng.randint(0, 9)}.py", line {rng.randint(1, 400)}, in run\n'
+                     f"    result = main(*args)\n" for _ in range(rng.randint(2, 30)))
+    args = ", ".join(str(rng.randint(-100, 100)) for _ in range(rng.randint(1, 8)))
+    return f"Traceback (most recent call last):\n{frames}AssertionError: main({args}) != {rng.randint(0, 99)}"
+
+
+def arrange(db: AppDatabase, variants: int, tasks: int, submissions: int):
+    rng = random.Random(42)
+    db.variants.create_by_ids(range(variants))
+    db.tasks.create_missing(list(range(tasks)), 0)
+    group = db.groups.create("bench").id
+    with db.unit_of_work():
+        for variant in range(variants):
+            for task in range(tasks):
+                for _ in range(submissions):
+                    code, output = make_code(rng, task), make_output(rng)
+                    message = db.messages.submit_task(task, variant, group, code, "127.0.0.1", None)
+                    status = db.statuses.check(task, variant, group, code, output is None, output, "127.0.0.1")
+                    db.checks.record_check(message.id, status.status, output)
+
+
+def size(path: str) -> int:
+    connection = sqlite3.connect(path)
+    connection.execute("VACUUM")
+    connection.close()
+    return os.path.getsize(path)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--variants", type=int, default=40)
+    parser.add_argument("--tasks", type=int, default=10)
+    parser.add_argument("--submissions", type=int, default=3)
+    args = parser.parse_args()
+    directory = tempfile.TemporaryDirectory()
+    path = os.path.join(directory.name, "bench.db")
+    connection = f"sqlite:///{path}"
+    migrate(connection)
+    arrange(AppDatabase(lambda: connection), args.variants, args.tasks, args.submissions)
+    engines.dispose()
+    compressed = size(path)
+    config = Config(os.path.join("webapp", "alembic.ini"))
+    config.set_main_option("sqlalchemy.url", connection)
+    config.set_main_option("script_location", os.path.join("webapp", "alembic"))
+    command.downgrade(config, UNCOMPRESSED)
+    plain = size(path)
+    print(f"Uncompressed: {plain / 1024:.1f} KiB")
+    print(f"Compressed: {compressed / 1024:.1f} KiB ({compressed / plain:.0%})")
+    directory.cleanup()
+
+
+if __name__ == "__main__":
+    main()
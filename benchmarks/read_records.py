@@ -0,0 +1,92 @@
+import os
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+from webapp.commands import migrate
+from webapp.models import Group, Student, TaskStatus, engines
+from webapp.repositories import RATED, AppDatabase
+
+
+def orm_queries(db: AppDatabase, group: int) -> dict:
+    def by_group():
+        with db.context.create_session() as session:
+            return session.query(TaskStatus).filter_by(group=group).all()
+
+    def rating():
+        with db.context.create_session() as session:
+            return session.query(Group, TaskStatus) \
+                .join(TaskStatus, TaskStatus.group == Group.id) \
+                .filter(TaskStatus.status.in_(RATED)) \
+                .all()
+
+    def students():
+        with db.context.create_session() as session:
+            return session.query(Student).filter(Student.group == group).all()
+
+    return dict(by_group=by_group, rating=rating, students=students)
+
+
+def record_queries(db: AppDatabase, group: int) -> dict:
+    return dict(
+        by_group=lambda: db.statuses.get_by_group(group),
+        rating=db.statuses.get_rating,
+        students=lambda: db.students.get_group_students(group),
+    )
+
+
+def measure(query, repeat: int) -> tuple[float, int, int]:
+    query()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        query()
+    elapsed = (time.perf_counter() - started) / repeat
+    tracemalloc.start()
+    rows = query()
+    _, peak = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+    del rows
+    return elapsed, peak, blocks
+
+
+def arrange(db: AppDatabase, variants: int, tasks: int) -> int:
+    db.variants.create_by_ids(range(variants))
+    db.tasks.create_missing(list(range(tasks)), 0)
+    group = db.groups.create("bench").id
+    with db.unit_of_work():
+        for variant in range(variants):
+            db.students.create(f"{variant}@bench.ru", "password")
+            for task in range(tasks):
+                db.statuses.check(task, variant, group, "main = lambda: 42" * 64, True, "ok" * 256, "127.0.0.1")
+    with db.context.create_session() as session:
+        session.query(Student).update(dict(group=str(group)))
+    return group
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--variants", type=int, default=40)
+    parser.add_argument("--tasks", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    directory = tempfile.TemporaryDirectory()
+    connection = f"sqlite:///{os.path.join(directory.name, 'bench.db')}"
+    migrate(connection)
+    db = AppDatabase(lambda: connection)
+    group = arrange(db, args.variants, args.tasks)
+    orm = orm_queries(db, group)
+    plain = record_queries(db, group)
+    for name in orm:
+        before = measure(orm[name], args.repeat)
+        after = measure(plain[name], args.repeat)
+        for title, (elapsed, peak, blocks) in (("orm", before), ("records", after)):
+            print(f"{name:>9} {title:>8}: {elapsed * 1000:7.2f} ms, "
+                  f"peak {peak / 1024:8.1f} KiB, {blocks} live allocations")
+    engines.dispose()
+    directory.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+from multiprocessing import Process
+
+from webapp.commands import migrate
+from webapp.dto import AppConfig
+from webapp.models import engines
+from webapp.repositories import AppDatabase
+from webapp.utils import load_config_files
+
+
+DEFAULT_PRAGMAS = dict(journal_mode="DELETE", synchronous="FULL", busy_timeout=30000)
+
+
+def submit(connection: str, pragmas: dict, group: int, task: int, variants: range):
+    engines.configure(pragmas)
+    db = AppDatabase(lambda: connection)
+    for variant in variants:
+        with db.unit_of_work():
+            db.messages.submit_task(task, variant, group, "main = lambda: 42", "127.0.0.1", None)
+            db.statuses.submit_task(task, variant, group, "main = lambda: 42", "127.0.0.1")
+
+
+def check(connection: str, pragmas: dict, total: int):
+    engines.configure(pragmas)
+    db = AppDatabase(lambda: connection)
+    processed = 0
+    while processed < total:
+        for message in db.messages.get_pending_messages():
+            with db.unit_of_work():
+                status = db.statuses.check(message.task, message.variant, message.group,
+                                           message.code, True, "", message.ip)
+                db.messages.mark_as_processed(message.id)
+                db.checks.record_check(message.id, status.status, "")
+            processed += 1
+
+
+def run(title: str, pragmas: dict, writers: int, submissions: int) -> float:
+    directory = tempfile.TemporaryDirectory()
+    connection = f"sqlite:///{os.path.join(directory.name, 'bench.db')}"
+    migrate(connection)
+    engines.configure(pragmas)
+    db = AppDatabase(lambda: connection)
+    db.variants.create_by_ids(range(writers * submissions))
+    group = db.groups.create(title).id
+    db.tasks.create(0)
+    engines.dispose()
+    started = time.perf_counter()
+    processes = [Process(target=check, args=(connection, pragmas, writers * submissions))]
+    for index in range(writers):
+        variants = range(index * submissions, (index + 1) * submissions)
+        processes.append(Process(target=submit, args=(connection, pragmas, group, 0, variants)))
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    engines.dispose()
+    directory.cleanup()
+    total = writers * submissions
+    print(f"{title}: {total} submissions and checks in {elapsed:.2f}s ({total / elapsed:.1f} ops/s)")
+    return elapsed
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--submissions", type=int, default=250)
+    args = parser.parse_args()
+    config = AppConfig(load_config_files(os.path.join(os.getcwd(), "webapp")))
+    before = run("default", DEFAULT_PRAGMAS, args.writers, args.submissions)
+    after = run("tuned", config.sqlite_pragmas, args.writers, args.submissions)
+    print(f"Speedup: {before / after:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import os
+import statistics
+import tempfile
+import time
+from argparse import ArgumentParser
+from multiprocessing import Process
+
+from webapp.commands import migrate
+from webapp.dto import AppConfig
+from webapp.models import engines
+from webapp.repositories import AppDatabase
+from webapp.utils import load_config_files
+from webapp.worker import background_worker
+
+
+def cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as stat:
+        fields = stat.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--submissions", type=int, default=20)
+    parser.add_argument("--idle", type=float, default=10)
+    args = parser.parse_args()
+    directory = tempfile.TemporaryDirectory()
+    connection = f"sqlite:///{os.path.join(directory.name, 'bench.db')}"
+    migrate(connection)
+    config = AppConfig({**load_config_files("webapp"), "CONNECTION_STRING": connection})
+    engines.configure(config.sqlite_pragmas)
+    db = AppDatabase(lambda: connection)
+    db.variants.create_by_ids(range(args.submissions))
+    db.tasks.create(0)
+    group = db.groups.create("bench").id
+    engines.dispose()
+    worker = Process(target=background_worker, args=(config,))
+    worker.start()
+    time.sleep(2)
+    latencies = []
+    for variant in range(args.submissions):
+        started = time.perf_counter()
+        message = db.messages.submit_task(0, variant, group, f"main = lambda: {variant}", "127.0.0.1", None)
+        while not db.messages.get_by_id(message.id).processed:
+            time.sleep(0.01)
+        latencies.append(time.perf_counter() - started)
+    idle = cpu_seconds(worker.pid)
+    time.sleep(args.idle)
+    idle = cpu_seconds(worker.pid) - idle
+    worker.terminate()
+    print(f"Submit to verdict: median {statistics.median(latencies) * 1000:.0f} ms, "
+          f"max {max(latencies) * 1000:.0f} ms")
+    print(f"Idle worker CPU: {idle / args.idle:.2%}")
+    engines.dispose()
+    directory.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,3 +8,7 @@ def analyze_solution(task, code):
     if rnd == 1:
         return True, (1, [0.1, 0.9])
     return False, (0, [])
+
+
+def analyze_solutions(task, codes):
+    return [analyze_solution(task, code) for code in codes]
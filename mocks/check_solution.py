@@ -1,12 +1,27 @@
+import time
+
+
 TESTS = [{"ИНБО-01-20": [list(range(40)), list(range(40))]}]
 GROUPS, TASKS = ["ИНБО-01-20"], [0, 1]
+BLOCKS = [{"title": "Блок №1", "weight": 1, "deadline": None, "tasks": TASKS}]
 
 
 def load_config():
     return GROUPS, TASKS, ''
 
 
+def load_blocks():
+    return BLOCKS
+
+
 def check_solution(group, task, variant, code):
+    if "# mock:timeout" in code:
+        time.sleep(60)
+    if "# mock:loop" in code:
+        while True:
+            pass
+    if "# mock:memory" in code:
+        return False, str(len(bytearray(4 * 1024 ** 3)))
     if "42" in code:
         return True, ""
     return False, "An error has occured."
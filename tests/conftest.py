@@ -3,7 +3,7 @@ import signal
 
 import pytest
 
-from flask import Flask
+from flask import Flask, request, request_finished
 from flask.testing import FlaskClient
 
 from webapp.app import configure_app, configure_background_services
@@ -11,6 +11,35 @@ from webapp.commands import migrate
 from webapp.repositories import AppDatabase
 
 
+QUERY_BUDGETS = {
+    "GET /": 5,
+    "GET /api/v1/group/<int:gid>/variant/<int:vid>/task/<int:tid>": 9,
+    "GET /api/v1/group/<int:gid>/variant/<int:vid>/task/list": 9,
+    "GET /api/v1/group/<string:prefix>": 4,
+    "GET /api/v1/group/prefixes": 5,
+    "GET /api/v1/variant/list": 4,
+    "GET /group/<int:gid>": 10,
+    "GET /logout": 3,
+    "GET /rating": 5,
+    "GET /rating/groups": 5,
+    "GET /register": 3,
+    "GET /submissions": 9,
+    "GET /teacher": 9,
+    "GET /teacher/group/<int:group_id>/exam": 6,
+    "GET /teacher/group/<int:group_id>/exam/csv": 10,
+    "GET /teacher/group/<int:group_id>/exam/toggle": 7,
+    "GET /teacher/group/select": 4,
+    "GET /teacher/messages": 7,
+    "GET /teacher/submissions/group/<int:gid>/variant/<int:vid>/task/<int:tid>": 10,
+    "POST /api/v1/group/<int:gid>/variant/<int:vid>/task/<int:tid>": 13,
+    "POST /login": 8,
+    "POST /logout/lks/backchannel": 5,
+    "POST /register": 6,
+    "POST /teacher/verify-block/many": 7,
+}
+DEFAULT_QUERY_BUDGET = 10
+
+
 @pytest.fixture()
 def app(request):
     param = request.param if hasattr(request, 'param') else None
@@ -35,6 +64,8 @@ def app(request):
     if param == 'enable-worker':
         wpid = app.config["WORKER_PID"]
         os.kill(wpid, signal.SIGTERM)
+        apid = app.config["ANALYTICS_PID"]
+        os.kill(apid, signal.SIGTERM)
     if param == 'enable-registration':
         mpid = app.config["MAILBOX_PID"]
         os.kill(mpid, signal.SIGTERM)
@@ -46,5 +77,23 @@ def db(app: Flask) -> AppDatabase:
 
 
 @pytest.fixture()
-def client(app: Flask) -> FlaskClient:
+def query_budget(app: Flask) -> dict[str, int]:
+    budgets = dict(QUERY_BUDGETS)
+    exceeded = []
+
+    def check(sender: Flask, response, **extra):
+        if request.url_rule is None or "X-DB-Queries" not in response.headers:
+            return
+        route = f"{request.method} {request.url_rule.rule}"
+        count, budget = int(response.headers["X-DB-Queries"]), budgets.get(route, DEFAULT_QUERY_BUDGET)
+        if count > budget:
+            exceeded.append(f"{route}: {count} queries, budget {budget}")
+
+    with request_finished.connected_to(check, app):
+        yield budgets
+    assert not exceeded, "Query budget exceeded: " + "; ".join(exceeded)
+
+
+@pytest.fixture()
+def client(app: Flask, query_budget: dict[str, int]) -> FlaskClient:
     return app.test_client()
@@ -1,7 +1,9 @@
 from secrets import token_hex
 
+from sqlalchemy import text
 from tests.utils import arrange_task, unique_str
 
+from webapp.models import CompressedText
 from webapp.repositories import AppDatabase
 
 
@@ -21,7 +23,7 @@ def test_get_by_student(db: AppDatabase):
     stat = db.statuses.submit_task(task_id, variant_id, group_id, code, ip)
     db.checks.record_check(message.id, stat.status, "test")
 
-    result = db.checks.get_by_student(student, 0, 10)
+    result = db.checks.get_by_student(student, 10)
 
     assert len(result) == 1
     assert result[0][1].code == code
@@ -100,7 +102,48 @@ def test_get_by_session_id(db: AppDatabase):
     stat = db.statuses.submit_task(task_id, variant_id, group_id, code, ip)
     db.checks.record_check(message.id, stat.status, "test")
 
-    result = db.checks.get_by_session_id(session_id=session_id, skip=0, take=10)
+    result = db.checks.get_by_session_id(session_id=session_id, take=10)
 
     assert len(result) == 1
     assert result[0][1].session_id == session_id
+
+
+def test_get_by_student_seeks_pages(db: AppDatabase):
+    group_id, variant_id, task_id = arrange_task(db)
+
+    student_email = f"{unique_str()}@test.ru"
+
+    student = db.students.create(student_email, unique_str())
+    db.students.update_group(student.id, group_id)
+
+    messages = []
+    for _ in range(5):
+        message = db.messages.submit_task(task_id, variant_id, group_id, unique_str(), "0.0.0.0", student.id)
+        db.checks.record_check(message.id, 0, None)
+        messages.append(message.id)
+
+    newest = [message.id for _, message in db.checks.get_by_student(student, 2)]
+    older = [message.id for _, message in db.checks.get_by_student(student, 2, after=newest[-1])]
+    newer = [message.id for _, message in db.checks.get_by_student(student, 2, before=older[0])]
+
+    assert newest == messages[:-3:-1]
+    assert older == messages[-3:-5:-1]
+    assert newer == newest
+    assert db.checks.count_student_submissions(student) == 5
+    assert db.checks.count_submissions_by_info(group_id, variant_id, task_id, True) == 5
+
+
+def test_record_check_compresses_long_output(db: AppDatabase):
+    group_id, variant_id, task_id = arrange_task(db)
+    output = "Traceback (most recent call last):\n" + "  File \"main.py\", line 1, in <module>\n" * 200
+
+    message = db.messages.submit_task(task_id, variant_id, group_id, unique_str(), "0.0.0.0", None)
+    db.checks.record_check(message.id, 0, output)
+
+    with db.context.create_session() as session:
+        stored = session.execute(text("SELECT output FROM message_checks WHERE message = :id"), dict(id=message.id))
+        raw = stored.scalar_one()
+
+    assert db.checks.get(message.id).output == output
+    assert raw[:1] == CompressedText.ZLIB
+    assert len(raw) < len(output) / 10
@@ -0,0 +1,35 @@
+import pytest
+from tests.utils import unique_int, unique_str
+
+from webapp import worker
+from webapp.repositories import AppDatabase
+
+
+def test_check_result_memoized_by_version(db: AppDatabase):
+    group, task, variant, code_hash = unique_str(), unique_int(), unique_int(), unique_str()
+
+    db.results.record(group, task, variant, code_hash, "1", False, "error")
+    db.results.record(group, task, variant, code_hash, "1", True, "")
+
+    cached = db.results.get(group, task, variant, code_hash, "1")
+    assert cached.ok
+    assert cached.output == ""
+    assert db.results.get(group, task, variant, code_hash, "2") is None
+
+
+def test_check_result_cache_cleared(db: AppDatabase):
+    group, task, variant, code_hash = unique_str(), unique_int(), unique_int(), unique_str()
+    db.results.record(group, task, variant, code_hash, "1", True, None)
+
+    assert db.results.clear() >= 1
+    assert db.results.get(group, task, variant, code_hash, "1") is None
+
+
+@pytest.mark.parametrize("code, other, same", [
+    ("main = lambda: 42\r\n", "main = lambda: 42\n", True),
+    ("main = lambda: 42\n\n  \n", "main = lambda: 42", True),
+    ('main = lambda: """a  \nb"""\n', 'main = lambda: """a\nb"""\n', False),
+    ("\nmain = lambda: 42\n", "main = lambda: 42\n", False),
+])
+def test_normalized_code_keeps_meaningful_whitespace(code: str, other: str, same: bool):
+    assert (worker.normalize_code(code) == worker.normalize_code(other)) == same
@@ -0,0 +1,37 @@
+from webapp.models import EngineRegistry
+
+
+def test_engine_is_reused():
+    registry = EngineRegistry()
+    connection = "sqlite://"
+
+    engine = registry.get_engine(connection)
+    maker = registry.get_session_maker(connection)
+
+    assert registry.get_engine(connection) is engine
+    assert registry.get_session_maker(connection) is maker
+    assert maker.kw["bind"] is engine
+
+
+def test_engine_is_recreated_after_fork():
+    registry = EngineRegistry()
+    connection = "sqlite://"
+
+    engine = registry.get_engine(connection)
+    registry.reset_after_fork()
+
+    assert registry.get_engine(connection) is not engine
+    registry.dispose()
+
+
+def test_sqlite_pragmas_are_applied_on_connect(tmp_path):
+    registry = EngineRegistry()
+    registry.configure(dict(journal_mode="WAL", synchronous="NORMAL", busy_timeout=1234))
+    connection = f"sqlite:///{tmp_path / 'pragmas.db'}"
+
+    with registry.get_engine(connection).connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 1234
+        assert conn.exec_driver_sql("PRAGMA foreign_keys").scalar() == 1
+    registry.dispose()
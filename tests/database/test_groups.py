@@ -36,3 +36,15 @@ def test_group_fetching_by_prefix(db: AppDatabase):
     assert any(group.title == one for group in groups)
     assert any(group.title == two for group in groups)
     assert not any(group.title == three for group in groups)
+
+
+def test_group_create_missing(db: AppDatabase):
+    existing = unique_str()
+    missing = unique_str()
+    db.groups.create_by_names([existing])
+
+    created = db.groups.create_missing([existing, missing, missing])
+
+    assert created == 1
+    assert len(db.groups.get_by_prefix(missing)) == 1
+    assert len(db.groups.get_by_prefix(existing)) == 1
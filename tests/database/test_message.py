@@ -1,5 +1,6 @@
 from tests.utils import arrange_task, unique_int, unique_str
 
+from webapp.models import CodeBlob, hash_code
 from webapp.repositories import AppDatabase
 
 
@@ -67,3 +68,58 @@ def test_message_get_pending(db: AppDatabase):
     assert not any(mess.processed for mess in messages)
     assert len(messages) == len(pending)
     assert messages[-1].code == pending[0].code
+
+
+def test_message_code_stored_once(db: AppDatabase):
+    (group, variant, task) = arrange_task(db)
+    code = unique_str()
+
+    first = db.messages.submit_task(task, variant, group, code, unique_str(), None)
+    second = db.messages.submit_task(task, variant, group, code, unique_str(), None)
+    status = db.statuses.submit_task(task, variant, group, code, unique_str())
+
+    with db.context.create_session() as session:
+        blobs = session.query(CodeBlob).filter_by(hash=hash_code(code)).all()
+
+    assert len(blobs) == 1
+    assert blobs[0].code == code
+    assert first.code_hash == second.code_hash == status.code_hash == hash_code(code)
+    assert db.messages.get_by_id(first.id).code == code
+    assert db.statuses.get_task_status(task, variant, group).code == code
+
+
+def test_message_claim_is_exclusive(db: AppDatabase):
+    (group, variant, task) = arrange_task(db)
+    message = db.messages.submit_task(task, variant, group, unique_str(), unique_str(), None)
+
+    first = db.messages.claim_next(10000, unique_str(), 60)
+    second = db.messages.claim_next(10000, unique_str(), 60)
+
+    assert any(claimed.id == message.id and claimed.code == message.code for claimed in first)
+    assert all(claimed.id != message.id for claimed in second)
+
+
+def test_message_claim_requeues_expired_lease(db: AppDatabase):
+    (group, variant, task) = arrange_task(db)
+    message = db.messages.submit_task(task, variant, group, unique_str(), unique_str(), None)
+    worker = unique_str()
+
+    db.messages.claim_next(10000, worker, 60)
+    db.messages.release(message.id, worker, -1)
+
+    assert any(claimed.id == message.id for claimed in db.messages.claim_next(10000, unique_str(), 60))
+
+
+def test_message_claim_waits_for_earlier_lease(db: AppDatabase):
+    (group, variant, task) = arrange_task(db)
+    first = db.messages.submit_task(task, variant, group, unique_str(), unique_str(), None)
+    second = db.messages.submit_task(task, variant, group, unique_str(), unique_str(), None)
+    worker, other = unique_str(), unique_str()
+
+    db.messages.claim_next(10000, worker, 60)
+    db.messages.release(second.id, worker, -1)
+    assert all(claimed.id != second.id for claimed in db.messages.claim_next(10000, other, 60))
+
+    db.messages.release(first.id, worker, -1)
+    claimed = [message.id for message in db.messages.claim_next(10000, other, 60)]
+    assert claimed.index(first.id) < claimed.index(second.id)
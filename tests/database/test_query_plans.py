@@ -0,0 +1,82 @@
+from secrets import token_hex
+
+import pytest
+from sqlalchemy import event
+from tests.utils import arrange_task, unique_str
+
+from flask import Flask
+
+from webapp.models import engines
+from webapp.repositories import AppDatabase
+
+
+LARGE_TABLES = ["messages", "message_checks", "students", "task_statuses"]
+
+
+def capture_queries(app: Flask, action) -> list[tuple[str, tuple]]:
+    engine = engines.get_engine(app.config["CONNECTION_STRING"])
+    queries = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            queries.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        action()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    with engine.connect() as conn:
+        return [(row[-1], statement)
+                for statement, parameters in queries
+                for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+
+
+@pytest.fixture()
+def arranged(db: AppDatabase):
+    group, variant, task = arrange_task(db)
+    email = f"{unique_str()}@test.ru"
+    student = db.students.create(email, unique_str())
+    db.students.update_group(student.id, group)
+    session_id = token_hex(16)
+    message = db.messages.submit_task(task, variant, group, unique_str(), unique_str(), student.id, session_id)
+    db.checks.record_check(message.id, 0, None)
+    return group, variant, task, student, email, session_id
+
+
+@pytest.mark.parametrize("query", [
+    lambda db, g, v, t, s, e, sid: db.messages.get_pending_messages(),
+    lambda db, g, v, t, s, e, sid: db.messages.get_next_pending_message(),
+    lambda db, g, v, t, s, e, sid: db.messages.get(t, v, g),
+    lambda db, g, v, t, s, e, sid: db.checks.get_by_student(s, 5),
+    lambda db, g, v, t, s, e, sid: db.checks.get_by_student(s, 5, after=1),
+    lambda db, g, v, t, s, e, sid: db.checks.get_by_student(s, 5, before=1),
+    lambda db, g, v, t, s, e, sid: db.checks.count_student_submissions(s),
+    lambda db, g, v, t, s, e, sid: db.checks.get_by_session_id(sid, 5, after=1),
+    lambda db, g, v, t, s, e, sid: db.checks.count_session_id_submissions(sid),
+    lambda db, g, v, t, s, e, sid: db.checks.get_by_task(g, v, t, 5, True, after=1),
+    lambda db, g, v, t, s, e, sid: db.checks.count_submissions_by_info(g, v, t, True),
+    lambda db, g, v, t, s, e, sid: db.students.find_by_email(e),
+    lambda db, g, v, t, s, e, sid: db.students.get_group_students(g),
+    lambda db, g, v, t, s, e, sid: db.students.get_free_variant(g),
+    lambda db, g, v, t, s, e, sid: db.statuses.get_by_group(g),
+])
+def test_hot_query_uses_index(app: Flask, db: AppDatabase, arranged, query):
+    plans = capture_queries(app, lambda: query(db, *arranged))
+    assert plans
+    for detail, statement in plans:
+        for table in LARGE_TABLES:
+            assert not detail.startswith(f"SCAN {table}"), f"{detail}\n{statement}"
+
+
+@pytest.mark.parametrize("query", [
+    lambda db, g, v, t, s, e, sid: db.checks.get_by_student(s, 5, after=1),
+    lambda db, g, v, t, s, e, sid: db.checks.get_by_student(s, 5, before=1),
+    lambda db, g, v, t, s, e, sid: db.checks.get_by_session_id(sid, 5, after=1),
+    lambda db, g, v, t, s, e, sid: db.checks.get_by_task(g, v, t, 5, False, before=1),
+])
+def test_keyset_pages_follow_index_order(app: Flask, db: AppDatabase, arranged, query):
+    plans = capture_queries(app, lambda: query(db, *arranged))
+    assert plans
+    for detail, statement in plans:
+        assert "TEMP B-TREE" not in detail, f"{detail}\n{statement}"
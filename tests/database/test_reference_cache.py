@@ -0,0 +1,93 @@
+from sqlalchemy import select
+from tests.utils import unique_str
+
+from webapp.models import Base, ReferenceVersion, engines
+from webapp.repositories import AppDatabase
+
+
+def test_reference_data_cached_within_unit_of_work(db: AppDatabase):
+    group = db.groups.create(unique_str())
+    other = AppDatabase(db.context.get_connection)
+
+    with db.unit_of_work():
+        assert db.groups.get_by_id(group.id).title == group.title
+        other.groups.rename(group.id, unique_str(), group.external)
+        assert db.groups.get_by_id(group.id).title == group.title
+
+
+def test_reference_data_refreshed_after_version_bump(db: AppDatabase):
+    group = db.groups.create(unique_str())
+    other = AppDatabase(db.context.get_connection)
+    title = unique_str()
+
+    with db.unit_of_work():
+        assert db.groups.get_by_id(group.id).title == group.title
+    other.groups.rename(group.id, title, group.external)
+
+    with db.unit_of_work():
+        assert db.groups.get_by_id(group.id).title == title
+
+
+def test_reference_data_invalidated_by_own_writes(db: AppDatabase):
+    group = db.groups.create(unique_str())
+    title = unique_str()
+
+    with db.unit_of_work():
+        assert db.groups.get_by_id(group.id).title == group.title
+        db.groups.rename(group.id, title, group.external)
+        assert db.groups.get_by_id(group.id).title == title
+
+    with db.unit_of_work():
+        assert any(item.title == title for item in db.groups.get_all())
+
+
+def test_reference_cache_bypassed_outside_unit_of_work(db: AppDatabase):
+    group = db.groups.create(unique_str())
+    other = AppDatabase(db.context.get_connection)
+    title = unique_str()
+
+    assert db.groups.get_by_id(group.id).title == group.title
+    other.groups.rename(group.id, title, group.external)
+    assert db.groups.get_by_id(group.id).title == title
+
+
+def test_reference_data_kept_when_nothing_created(db: AppDatabase):
+    group = db.groups.create(unique_str())
+    other = AppDatabase(db.context.get_connection)
+    title = unique_str()
+
+    with db.unit_of_work():
+        assert db.groups.get_by_id(group.id).title == group.title
+        other.groups.rename(group.id, title, group.external)
+        assert db.groups.create_missing([title]) == 0
+        assert db.groups.get_by_id(group.id).title == group.title
+        assert db.groups.create_missing([unique_str()]) == 1
+        assert db.groups.get_by_id(group.id).title == title
+
+
+def test_reference_cache_keyed_by_arguments(db: AppDatabase):
+    first, second = db.groups.create(unique_str()), db.groups.create(unique_str())
+
+    with db.unit_of_work():
+        assert db.groups.get_by_id(first.id).title == first.title
+        assert db.groups.get_by_id(group_id=first.id).title == first.title
+        assert db.groups.get_by_id(group_id=second.id).title == second.title
+
+
+def test_reference_cache_keyed_by_connection(db: AppDatabase, tmp_path):
+    db.groups.create(unique_str())
+    connection = db.context.get_connection()
+    other = f"sqlite:///{tmp_path / 'other.db'}"
+    Base.metadata.create_all(engines.get_engine(other))
+    with db.context.create_session() as session:
+        versions = session.execute(select(ReferenceVersion.name, ReferenceVersion.version)).all()
+    with AppDatabase(lambda: other).context.create_session() as session:
+        session.add_all(ReferenceVersion(name=name, version=version) for name, version in versions)
+    current = [connection]
+    shared = AppDatabase(lambda: current[0])
+
+    with shared.unit_of_work():
+        assert shared.groups.get_all()
+    current[0] = other
+    with shared.unit_of_work():
+        assert shared.groups.get_all() == []
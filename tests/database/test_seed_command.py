@@ -0,0 +1,24 @@
+import json
+import os
+import shutil
+
+from webapp.commands import SeedCmd
+from webapp.repositories import AppDatabase
+
+
+def test_seed_is_incremental(tmp_path):
+    tests = os.path.join(os.getcwd(), "tests")
+    connection = f"sqlite:///{tmp_path / 'seed.db'}"
+    shutil.copy(os.path.join(tests, "config.defaults.json"), tmp_path / "config.defaults.json")
+    with open(tmp_path / "config.local.json", "w") as file:
+        file.write(json.dumps(dict(CONNECTION_STRING=connection)))
+
+    SeedCmd().run(str(tmp_path))
+    SeedCmd().run(str(tmp_path))
+
+    db = AppDatabase(lambda: connection)
+    blocks = db.tasks.get_blocks()
+    assert [group.title for group in db.groups.get_all()] == ["ИНБО-01-20"]
+    assert [variant.id for variant in db.variants.get_all()] == list(range(40))
+    assert [block.title for block in blocks] == ["Блок №1"]
+    assert [task.id for task in db.tasks.get_all_in_block(blocks[0].id)] == [0, 1]
@@ -18,3 +18,14 @@ def test_task_fetching_by_id(db: AppDatabase):
 
     task = db.tasks.get_by_id(task_id)
     assert task.id == task_id
+
+
+def test_task_create_missing(db: AppDatabase):
+    existing = unique_int()
+    missing = unique_int()
+    db.tasks.create(existing)
+
+    created = db.tasks.create_missing([existing, missing])
+
+    assert created == 1
+    assert db.tasks.get_by_id(missing).id == missing
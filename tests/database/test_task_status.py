@@ -1,7 +1,9 @@
+import pytest
+from sqlalchemy import inspect
 from tests.utils import arrange_task, unique_int, unique_str
 
-from webapp.models import Status
-from webapp.repositories import AppDatabase
+from webapp.models import Status, Transition, get_next_status
+from webapp.repositories import AppDatabase, GroupRecord, StatusRecord
 
 
 def test_task_status_creation(db: AppDatabase):
@@ -26,6 +28,34 @@ def test_task_status_fetching_by_group(db: AppDatabase):
     assert all(task.task == task_1 or task.task == task_2 for task in status)
 
 
+def test_task_status_listing_skips_text_columns(db: AppDatabase):
+    (group, variant, task) = arrange_task(db)
+    code = unique_str()
+    db.statuses.submit_task(task, variant, group, code, unique_str())
+
+    listed = [status for status in db.statuses.get_by_group(group) if status.task == task]
+    everything = [status for status in db.statuses.get_all() if status.task == task]
+
+    assert isinstance(listed[0], StatusRecord)
+    assert not hasattr(listed[0], "code")
+    assert listed[0].status == Status.Submitted
+    assert {"code", "output"} <= inspect(everything[0]).unloaded
+    assert db.statuses.get_task_status(task, variant, group).code == code
+
+
+def test_task_status_rating_records(db: AppDatabase):
+    (group, variant, task) = arrange_task(db)
+    db.statuses.check(task, variant, group, unique_str(), True, None, unique_str())
+
+    rated = [(g, status) for g, status in db.statuses.get_rating() if g.id == group and status.task == task]
+    ranked = [(g, var) for g, var in db.statuses.get_group_rating() if g.id == group]
+
+    assert len(rated) == 1
+    assert isinstance(rated[0][0], GroupRecord)
+    assert rated[0][1].status == Status.Checked
+    assert len(ranked) == 1
+
+
 def test_task_status_get_task_status(db: AppDatabase):
     (group, variant, task) = arrange_task(db)
     code = unique_str()
@@ -66,3 +96,143 @@ def test_task_status_check_unexisting(db: AppDatabase):
         db.statuses.check(task, variant, group, unique_str(), ok, unique_str(), unique_str())
         task_status = db.statuses.get_task_status(task, variant, group)
         assert task_status.status == expected
+
+
+PATHS = {
+    Status.Submitted: [Transition.Submit],
+    Status.Checked: [Transition.Accept],
+    Status.CheckedSubmitted: [Transition.Accept, Transition.Submit],
+    Status.CheckedFailed: [Transition.Accept, Transition.Reject],
+    Status.Verified: [Transition.Accept, Transition.Verify],
+    Status.VerifiedSubmitted: [Transition.Accept, Transition.Verify, Transition.Submit],
+    Status.VerifiedFailed: [Transition.Accept, Transition.Verify, Transition.Reject],
+    Status.Failed: [Transition.Reject],
+}
+
+
+def apply_transition(db: AppDatabase, task: int, variant: int, group: int, reviewer: int, transition: Transition):
+    match transition:
+        case Transition.Accept | Transition.Reject:
+            ok = transition == Transition.Accept
+            db.statuses.check(task, variant, group, unique_str(), ok, unique_str(), unique_str())
+        case Transition.Submit:
+            db.statuses.submit_task(task, variant, group, unique_str(), unique_str())
+        case Transition.Verify:
+            db.statuses.verify(task, variant, group, reviewer)
+        case Transition.Unverify:
+            db.statuses.unverify(task, variant, group, reviewer)
+
+
+def test_task_status_upserted_in_place(db: AppDatabase):
+    (group, variant, task) = arrange_task(db)
+    code = unique_str()
+
+    created = db.statuses.submit_task(task, variant, group, unique_str(), "ip")
+    assert created.status == Status.Submitted
+    assert created.reviewer is None
+    assert created.reviewed_at is None
+
+    updated = db.statuses.check(task, variant, group, code, True, "ok", "ip")
+    assert updated.status == Status.Checked
+    assert updated.code == code
+
+    statuses = [s for s in db.statuses.get_by_group(group) if s.task == task]
+    assert len(statuses) == 1
+    assert db.statuses.get_task_status(task, variant, group).output == "ok"
+
+
+@pytest.mark.parametrize("transition", list(Transition))
+@pytest.mark.parametrize("current", [None, *(status for status in Status if status != Status.NotSubmitted)])
+def test_task_status_transitions_match_python(db: AppDatabase, transition: Transition, current: Status | None):
+    (group, variant, task) = arrange_task(db)
+    reviewer = db.students.create(f"{unique_str()}@test.ru", unique_str(), True).id
+    for step in PATHS.get(current, []):
+        apply_transition(db, task, variant, group, reviewer, step)
+    assert (current and db.statuses.get_task_status(task, variant, group).status) == current
+
+    apply_transition(db, task, variant, group, reviewer, transition)
+
+    status = db.statuses.get_task_status(task, variant, group)
+    assert (status and status.status) == get_next_status(transition, current)
+
+
+def test_task_status_verify_keeps_submission(db: AppDatabase):
+    (group, variant, task) = arrange_task(db)
+    reviewer = db.students.create(f"{unique_str()}@test.ru", unique_str(), True).id
+    code = unique_str()
+    db.statuses.submit_task(task, variant, group, code, "ip")
+    db.statuses.check(task, variant, group, code, True, "output", "ip")
+
+    verified = db.statuses.verify(task, variant, group, reviewer)
+    assert verified.status == Status.Verified
+    assert verified.reviewer == reviewer
+    assert verified.reviewed_at is not None
+    assert verified.code == code
+    assert verified.output == "output"
+
+    checked = db.statuses.check(task, variant, group, code, False, "error", "ip")
+    assert checked.status == Status.VerifiedFailed
+    assert checked.reviewer == reviewer
+
+
+def test_task_status_verify_many(db: AppDatabase):
+    (group, variant, task_1) = arrange_task(db)
+    reviewer = db.students.create(f"{unique_str()}@test.ru", unique_str(), True).id
+    task_2, task_3, task_4 = unique_int(), unique_int(), unique_int()
+    for task in [task_2, task_3, task_4]:
+        db.tasks.create(task)
+    db.statuses.check(task_1, variant, group, unique_str(), True, None, "ip")
+    db.statuses.check(task_2, variant, group, unique_str(), False, None, "ip")
+    db.statuses.check(task_3, variant, group, unique_str(), True, None, "ip")
+    db.statuses.submit_task(task_3, variant, group, unique_str(), "ip")
+
+    verified = db.statuses.verify_many([task_1, task_2, task_3, task_4], [variant], group, reviewer)
+    assert sorted(status.task for status in verified) == sorted([task_1, task_3])
+    assert db.statuses.get_task_status(task_1, variant, group).status == Status.Verified
+    assert db.statuses.get_task_status(task_2, variant, group).status == Status.Failed
+    assert db.statuses.get_task_status(task_2, variant, group).reviewer is None
+    assert db.statuses.get_task_status(task_3, variant, group).status == Status.VerifiedSubmitted
+    assert db.statuses.get_task_status(task_4, variant, group) is None
+
+    unverified = db.statuses.unverify_many([task_1, task_2, task_3], [variant], group, reviewer)
+    assert len(unverified) == 2
+    assert db.statuses.get_task_status(task_1, variant, group).status == Status.Checked
+    assert db.statuses.get_task_status(task_3, variant, group).status == Status.CheckedSubmitted
+
+
+def test_task_status_achievements_merged_as_bitmask(db: AppDatabase):
+    (group, variant, task) = arrange_task(db)
+    db.statuses.check(task, variant, group, unique_str(), True, None, unique_str())
+    other = AppDatabase(db.context.get_connection)
+
+    db.statuses.record_analytics(task, variant, group, 2)
+    other.statuses.record_analytics(task, variant, group, 0, "output")
+    db.statuses.record_analytics(task, variant, group, 2)
+    status = db.statuses.get_task_status(task, variant, group)
+
+    assert status.achievements == 0b101
+    assert status.output == "output"
+    assert next(record for record in db.statuses.get_by_group(group) if record.task == task).achievements == 0b101
+
+
+def test_task_status_achievements_ignored_without_status(db: AppDatabase):
+    (group, variant, task) = arrange_task(db)
+
+    db.statuses.record_analytics(task, variant, group, 1)
+
+    assert db.statuses.get_task_status(task, variant, group) is None
+
+
+def test_task_status_analytics_output_kept_for_newer_code(db: AppDatabase):
+    (group, variant, task) = arrange_task(db)
+    (code, newer) = (unique_str(), unique_str())
+    db.statuses.check(task, variant, group, code, True, None, unique_str())
+    db.statuses.record_analytics(task, variant, group, 0, "first", code)
+    assert db.statuses.get_task_status(task, variant, group).output == "first"
+    db.statuses.check(task, variant, group, newer, False, "error", unique_str())
+
+    db.statuses.record_analytics(task, variant, group, 1, "second", code)
+    status = db.statuses.get_task_status(task, variant, group)
+
+    assert status.achievements == 0b11
+    assert status.output == "error"
@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+from tests.utils import arrange_task, unique_str
+
+from webapp.models import Status
+from webapp.repositories import AppDatabase
+
+
+def test_unit_of_work_commits_once(db: AppDatabase):
+    (group, variant, task) = arrange_task(db)
+    code = unique_str()
+    other = AppDatabase(db.context.get_connection)
+
+    with db.unit_of_work():
+        message = db.messages.submit_task(task, variant, group, code, unique_str(), None)
+        db.statuses.submit_task(task, variant, group, code, unique_str())
+        assert message.id is not None
+        assert db.statuses.get_task_status(task, variant, group).code == code
+
+    status = other.statuses.get_task_status(task, variant, group)
+    assert other.messages.get_by_id(message.id).code == code
+    assert status.status == Status.Submitted
+
+
+def test_unit_of_work_rolls_back_on_error(db: AppDatabase):
+    (group, variant, task) = arrange_task(db)
+
+    with pytest.raises(ValueError):
+        with db.unit_of_work():
+            db.messages.submit_task(task, variant, group, unique_str(), unique_str(), None)
+            db.statuses.submit_task(task, variant, group, unique_str(), unique_str())
+            raise ValueError()
+
+    assert db.messages.get(task, variant, group) == []
+    assert db.statuses.get_task_status(task, variant, group) is None
+
+
+def test_unit_of_work_rolls_back_on_repository_error(db: AppDatabase):
+    (group, variant, task) = arrange_task(db)
+
+    title = db.groups.get_by_id(group).title
+
+    with db.unit_of_work():
+        db.statuses.submit_task(task, variant, group, unique_str(), unique_str())
+        with pytest.raises(IntegrityError):
+            db.groups.create(title)
+
+    assert db.statuses.get_task_status(task, variant, group) is None
@@ -18,3 +18,14 @@ def test_variant_fetching_by_id(db: AppDatabase):
 
     variant = db.variants.get_by_id(variant_id)
     assert variant.id == variant_id
+
+
+def test_variant_create_missing(db: AppDatabase):
+    existing = unique_int()
+    missing = unique_int()
+    db.variants.create_by_ids([existing])
+
+    created = db.variants.create_missing([existing, missing])
+
+    assert created == 1
+    assert db.variants.get_by_id(missing).id == missing
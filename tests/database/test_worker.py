@@ -0,0 +1,507 @@
+import datetime
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event
+from tests.utils import arrange_task, unique_str
+
+from flask import Flask
+
+from webapp import worker
+from webapp.dto import AppConfig
+from webapp.managers import ExternalTaskManager
+from webapp.models import CheckResult, Status, engines
+from webapp.repositories import AppDatabase
+
+
+def check_solution(group: str, task: int, variant: int, code: str):
+    if "crash" in code:
+        raise RuntimeError("checker crashed")
+    if "slow" in code:
+        time.sleep(0.5)
+    return "accept" in code, str(os.getpid())
+
+
+@pytest.fixture()
+def config(app: Flask, monkeypatch) -> AppConfig:
+    monkeypatch.setattr(worker, "load_core", lambda core_path: SimpleNamespace(check_solution=check_solution))
+    app.config["ENABLE_CHECK_CACHE"] = False
+    return AppConfig(app.config)
+
+
+def process(config: AppConfig, db: AppDatabase, version: str | None = None, pool: worker.CheckerPool | None = None):
+    checkers = pool or worker.CheckerPool(config)
+    try:
+        external = ExternalTaskManager(db.groups, db.tasks)
+        name, version = unique_str(), version or unique_str()
+        while worker.process_pending_messages(config, db, external, version, checkers, name):
+            pass
+    finally:
+        if pool is None:
+            checkers.close()
+
+
+def count_cached_checks(db: AppDatabase) -> int:
+    with db.context.create_session() as session:
+        return session.query(CheckResult).count()
+
+
+def write_core(path: str, version: str):
+    with open(os.path.join(path, "check_solution.py"), "w") as stream:
+        stream.write(f"""import os
+
+PREPARED = dict()
+
+
+def prepare(task):
+    PREPARED[task] = PREPARED.get(task, 0) + 1
+
+
+def check_solution(group, task, variant, code):
+    return True, f"{version} {{os.getppid()}} {{PREPARED.get(task)}}"
+""")
+
+
+def test_pending_messages_checked_concurrently(config: AppConfig, db: AppDatabase):
+    tasks = [arrange_task(db) for _ in range(2)]
+    for group, variant, task in tasks:
+        db.messages.submit_task(task, variant, group, f"slow accept {unique_str()}", unique_str(), None)
+
+    process(config, db)
+
+    statuses = [db.statuses.get_task_status(task, variant, group) for group, variant, task in tasks]
+    assert all(status.status == Status.Checked for status in statuses)
+    assert len({status.output for status in statuses}) == 2
+
+
+def test_pending_messages_committed_in_submission_order(config: AppConfig, db: AppDatabase):
+    (group, variant, task) = arrange_task(db)
+    first = db.messages.submit_task(task, variant, group, f"slow accept {unique_str()}", unique_str(), None)
+    second = db.messages.submit_task(task, variant, group, f"reject {unique_str()}", unique_str(), None)
+
+    process(config, db)
+
+    assert db.statuses.get_task_status(task, variant, group).status == Status.CheckedFailed
+    assert db.checks.get(first.id).status == Status.Checked
+    assert db.checks.get(second.id).status == Status.CheckedFailed
+
+
+def test_failed_check_holds_back_later_submissions(config: AppConfig, db: AppDatabase):
+    (group, variant, task) = arrange_task(db)
+    first = db.messages.submit_task(task, variant, group, f"crash {unique_str()}", unique_str(), None)
+    second = db.messages.submit_task(task, variant, group, f"accept {unique_str()}", unique_str(), None)
+    checkers = worker.CheckerPool(config)
+    try:
+        external = ExternalTaskManager(db.groups, db.tasks)
+        worker.process_pending_messages(config, db, external, unique_str(), checkers, unique_str())
+    finally:
+        checkers.close()
+
+    assert not db.messages.get_by_id(first.id).processed
+    assert not db.messages.get_by_id(second.id).processed
+    assert db.statuses.get_task_status(task, variant, group) is None
+    db.messages.mark_as_processed(first.id)
+    db.messages.mark_as_processed(second.id)
+
+
+def test_checker_processes_recycled(app: Flask, config: AppConfig, db: AppDatabase):
+    app.config["CHECKER_CONCURRENCY"] = 1
+    app.config["CHECKER_RECYCLE_AFTER"] = 1
+    config = AppConfig(app.config)
+    tasks = [arrange_task(db) for _ in range(3)]
+    for group, variant, task in tasks:
+        db.messages.submit_task(task, variant, group, f"reject {unique_str()}", unique_str(), None)
+
+    process(config, db)
+
+    outputs = {db.statuses.get_task_status(task, variant, group).output for group, variant, task in tasks}
+    assert len(outputs) == 3
+
+
+def test_pending_signal_wakes_on_submission(app: Flask, db: AppDatabase):
+    (group, variant, task) = arrange_task(db)
+    signal = worker.PendingSignal(app.config["CONNECTION_STRING"])
+    try:
+        assert not signal.wait(0.2)
+        db.messages.submit_task(task, variant, group, f"reject {unique_str()}", unique_str(), None)
+        started = time.monotonic()
+        assert signal.wait(5)
+        assert time.monotonic() - started < 1
+    finally:
+        signal.close()
+
+
+def test_pending_signal_ignores_changes_before_reset(app: Flask, db: AppDatabase):
+    (group, variant, task) = arrange_task(db)
+    signal = worker.PendingSignal(app.config["CONNECTION_STRING"])
+    try:
+        message = db.messages.submit_task(task, variant, group, f"reject {unique_str()}", unique_str(), None)
+        db.messages.mark_as_processed(message.id)
+        signal.reset()
+        assert not signal.wait(0.2)
+    finally:
+        signal.close()
+
+
+def test_pending_message_lookups_prefetched_per_batch(app: Flask, config: AppConfig, db: AppDatabase):
+    app.config["ENABLE_CHECK_CACHE"] = True
+    config = AppConfig(app.config)
+    (group, variant, task) = arrange_task(db)
+    for _ in range(3):
+        db.messages.submit_task(task, variant, group, f"reject {unique_str()}", unique_str(), None)
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = engines.get_engine(app.config["CONNECTION_STRING"])
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        process(config, db)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert db.statuses.get_task_status(task, variant, group).status == Status.Failed
+    assert sum("FROM groups" in statement or "JOIN groups" in statement for statement in statements) == 1
+    assert sum("FROM check_results" in statement for statement in statements) == 1
+
+
+def test_check_results_group_committed(app: Flask, config: AppConfig, db: AppDatabase):
+    app.config["ENABLE_CHECK_CACHE"] = True
+    config = AppConfig(app.config)
+    version = unique_str()
+    tasks = [arrange_task(db) for _ in range(3)]
+    codes = [f"reject {unique_str()}" for _ in tasks]
+    for (group, variant, task), code in zip(tasks, codes):
+        db.messages.submit_task(task, variant, group, code, unique_str(), None)
+    process(config, db, version)
+    for (group, variant, task), code in zip(tasks, codes):
+        db.messages.submit_task(task, variant, group, code, unique_str(), None)
+    transactions = [[]]
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        transactions[-1].append(statement)
+
+    def commit(conn):
+        transactions.append([])
+
+    engine = engines.get_engine(app.config["CONNECTION_STRING"])
+    event.listen(engine, "before_cursor_execute", record)
+    event.listen(engine, "commit", commit)
+    try:
+        process(config, db, version)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+        event.remove(engine, "commit", commit)
+
+    writes = [statements for statements in transactions if any("message_checks" in item for item in statements)]
+    assert len(writes) == 1
+    assert sum("INSERT INTO message_checks" in item for item in writes[0]) == 3
+
+
+def test_check_results_committed_atomically(config: AppConfig, db: AppDatabase, monkeypatch):
+    (group, variant, task) = arrange_task(db)
+    (other_group, other_variant, other_task) = arrange_task(db)
+    broken = db.messages.submit_task(task, variant, group, f"accept {unique_str()}", unique_str(), None)
+    other = db.messages.submit_task(
+        other_task, other_variant, other_group, f"accept {unique_str()}", unique_str(), None)
+    record_check = db.checks.record_check
+
+    def fail(message: int, *args, **kwargs):
+        if message == broken.id:
+            raise RuntimeError("write failed")
+        return record_check(message, *args, **kwargs)
+
+    monkeypatch.setattr(db.checks, "record_check", fail)
+    process(config, db)
+
+    assert not db.messages.get_by_id(broken.id).processed
+    assert db.statuses.get_task_status(task, variant, group) is None
+    assert db.messages.get_by_id(other.id).processed
+    assert db.checks.get(other.id).status == Status.Checked
+
+
+def test_released_message_blocks_next_claim_of_same_worker(config: AppConfig, db: AppDatabase):
+    (group, variant, task) = arrange_task(db)
+    first = db.messages.submit_task(task, variant, group, f"crash {unique_str()}", unique_str(), None)
+    checkers = worker.CheckerPool(config)
+    try:
+        external = ExternalTaskManager(db.groups, db.tasks)
+        name, version = unique_str(), unique_str()
+        worker.process_pending_messages(config, db, external, version, checkers, name)
+        second = db.messages.submit_task(task, variant, group, f"accept {unique_str()}", unique_str(), None)
+        worker.process_pending_messages(config, db, external, version, checkers, name)
+    finally:
+        checkers.close()
+
+    assert not db.messages.get_by_id(first.id).processed
+    assert not db.messages.get_by_id(second.id).processed
+    assert db.statuses.get_task_status(task, variant, group) is None
+    db.messages.mark_as_processed(first.id)
+    db.messages.mark_as_processed(second.id)
+
+
+def test_failed_commit_holds_back_later_submissions(config: AppConfig, db: AppDatabase, monkeypatch):
+    (group, variant, task) = arrange_task(db)
+    broken = db.messages.submit_task(task, variant, group, f"accept {unique_str()}", unique_str(), None)
+    later = db.messages.submit_task(task, variant, group, f"reject {unique_str()}", unique_str(), None)
+    record_check = db.checks.record_check
+
+    def fail(message: int, *args, **kwargs):
+        if message == broken.id:
+            raise RuntimeError("write failed")
+        return record_check(message, *args, **kwargs)
+
+    monkeypatch.setattr(db.checks, "record_check", fail)
+    process(config, db)
+
+    assert not db.messages.get_by_id(broken.id).processed
+    assert not db.messages.get_by_id(later.id).processed
+    assert db.statuses.get_task_status(task, variant, group) is None
+    db.messages.mark_as_processed(broken.id)
+    db.messages.mark_as_processed(later.id)
+
+
+@pytest.mark.parametrize("code, output", [
+    ("# mock:timeout", worker.TIME_LIMIT_EXCEEDED.format(1)),
+    ("# mock:loop", worker.TIME_LIMIT_EXCEEDED.format(1)),
+    ("# mock:memory", worker.MEMORY_LIMIT_EXCEEDED.format(1024)),
+])
+def test_runaway_solutions_fail_within_limits(app: Flask, db: AppDatabase, code: str, output: str):
+    app.config["CHECK_TIME_LIMIT"] = 1
+    config = AppConfig(app.config)
+    (group, variant, task) = arrange_task(db)
+    db.messages.submit_task(task, variant, group, f"{code} {unique_str()}", unique_str(), None)
+    cached = count_cached_checks(db)
+
+    started = time.monotonic()
+    process(config, db)
+
+    assert time.monotonic() - started < 5
+    status = db.statuses.get_task_status(task, variant, group)
+    assert status.status == Status.Failed
+    assert status.output == output
+    assert count_cached_checks(db) == cached
+
+
+def test_sandboxed_solution_cannot_forge_verdict(app: Flask, db: AppDatabase, tmp_path):
+    with open(os.path.join(tmp_path, "check_solution.py"), "w") as stream:
+        stream.write("""import os
+
+
+def check_solution(group, task, variant, code):
+    for fd in range(3, 1024):
+        try:
+            os.write(fd, b'["verdict", true, ""]')
+        except OSError:
+            pass
+    os._exit(0)
+""")
+    app.config["CORE_PATH"] = str(tmp_path)
+    config = AppConfig(app.config)
+    (group, variant, task) = arrange_task(db)
+    db.messages.submit_task(task, variant, group, unique_str(), unique_str(), None)
+
+    process(config, db)
+
+    status = db.statuses.get_task_status(task, variant, group)
+    assert status.status == Status.Failed
+    assert status.output == worker.SOLUTION_CRASHED.format("код 0")
+
+
+@pytest.mark.parametrize("data", ['["verdict", 1, ""]', '["verdict", true]', '{"ok": true}', "(True, '')", ""])
+def test_malformed_verdicts_rejected(data: str):
+    (ok, output, cacheable) = worker.parse_verdict(data)
+    assert not ok
+    assert not cacheable
+
+
+def test_sandboxed_checker_survives_runaway_solution(app: Flask, db: AppDatabase):
+    app.config["ENABLE_CHECK_CACHE"] = False
+    app.config["CHECK_TIME_LIMIT"] = 1
+    app.config["CHECKER_CONCURRENCY"] = 1
+    config = AppConfig(app.config)
+    (group, variant, task) = arrange_task(db)
+    (other_group, other_variant, other_task) = arrange_task(db)
+    db.messages.submit_task(task, variant, group, f"# mock:loop {unique_str()}", unique_str(), None)
+    db.messages.submit_task(other_task, other_variant, other_group, "main = lambda: 42", unique_str(), None)
+
+    process(config, db)
+
+    assert db.statuses.get_task_status(task, variant, group).status == Status.Failed
+    assert db.statuses.get_task_status(other_task, other_variant, other_group).status == Status.Checked
+
+
+def test_checker_core_preloaded_and_prepared_once(app: Flask, db: AppDatabase, tmp_path):
+    write_core(str(tmp_path), "first")
+    app.config["CORE_PATH"] = str(tmp_path)
+    app.config["CHECKER_CONCURRENCY"] = 1
+    config = AppConfig(app.config)
+    (group, variant, task) = arrange_task(db)
+    messages = [db.messages.submit_task(task, variant, group, unique_str(), unique_str(), None) for _ in range(3)]
+
+    process(config, db)
+
+    outputs = {db.checks.get(message.id).output for message in messages}
+    assert len(outputs) == 1
+    (name, _, prepared) = outputs.pop().split(" ")
+    assert name == "first"
+    assert prepared == "1"
+
+
+def test_checker_pool_reloaded_when_core_changes(app: Flask, db: AppDatabase, tmp_path):
+    write_core(str(tmp_path), "first")
+    app.config["CORE_PATH"] = str(tmp_path)
+    config = AppConfig(app.config)
+    (group, variant, task) = arrange_task(db)
+    pool = worker.CheckerPool(config, worker.get_checker_version(config))
+    pool.warm()
+    try:
+        first = db.messages.submit_task(task, variant, group, unique_str(), unique_str(), None)
+        process(config, db, pool.version, pool)
+        write_core(str(tmp_path), "second version")
+        pool.reload(worker.get_checker_version(config))
+        second = db.messages.submit_task(task, variant, group, unique_str(), unique_str(), None)
+        process(config, db, pool.version, pool)
+    finally:
+        pool.close()
+
+    (name, checker, _) = db.checks.get(first.id).output.split(" ")
+    assert name == "first"
+    assert db.checks.get(second.id).output.startswith("second version ")
+    assert f" {checker} " not in db.checks.get(second.id).output
+
+
+def test_verdicts_published_before_analysis(config: AppConfig, db: AppDatabase, monkeypatch):
+    monkeypatch.setattr(worker, "analyze_solutions", lambda *args: pytest.fail("analyzed inline"))
+    (group, variant, task) = arrange_task(db)
+    accepted = db.messages.submit_task(task, variant, group, f"accept {unique_str()}", unique_str(), None)
+    rejected = db.messages.submit_task(task, variant, group, f"reject {unique_str()}", unique_str(), None)
+
+    process(config, db)
+
+    assert db.checks.get(accepted.id).status == Status.Checked
+    assert not db.checks.get(accepted.id).analyzed
+    assert db.checks.get(rejected.id).analyzed
+    assert db.statuses.get_task_status(task, variant, group).achievements == 0
+
+
+def test_accepted_solutions_analyzed_in_batches(config: AppConfig, db: AppDatabase, monkeypatch):
+    calls = []
+
+    def analyze_solutions(analytics_path: str, task: int, codes: list[str]):
+        calls.append((task, codes))
+        return [(True, (1, [0.1, 0.9])) for _ in codes]
+
+    monkeypatch.setattr(worker, "analyze_solutions", analyze_solutions)
+    external = ExternalTaskManager(db.groups, db.tasks)
+    while worker.analyze_pending_checks(config, db, external):
+        calls.clear()
+    (group, variant, task) = arrange_task(db)
+    codes = [f"accept {unique_str()}" for _ in range(3)]
+    messages = [db.messages.submit_task(task, variant, group, code, unique_str(), None) for code in codes]
+    process(config, db)
+
+    while worker.analyze_pending_checks(config, db, external):
+        pass
+
+    assert len(calls) == 1
+    assert sorted(calls[0][1]) == sorted(codes)
+    assert all(db.checks.get(message.id).achievement == 1 for message in messages)
+    assert db.statuses.get_task_status(task, variant, group).achievements == 0b10
+    assert worker.analyze_pending_checks(config, db, external) == 0
+
+
+@pytest.mark.parametrize("truncate", [False, True])
+def test_failed_analysis_retried_per_solution(config: AppConfig, db: AppDatabase, monkeypatch, truncate: bool):
+    calls = []
+
+    def analyze_solutions(analytics_path: str, task: int, codes: list[str]):
+        calls.append(codes)
+        if any("broken" in code for code in codes):
+            raise RuntimeError("analysis failed")
+        results = [(True, (1, [0.1, 0.9])) for _ in codes]
+        return results[:1] if truncate and len(codes) > 1 else results
+
+    monkeypatch.setattr(worker, "analyze_solutions", analyze_solutions)
+    external = ExternalTaskManager(db.groups, db.tasks)
+    while worker.analyze_pending_checks(config, db, external):
+        calls.clear()
+    (group, variant, task) = arrange_task(db)
+    marker = "" if truncate else "broken"
+    codes = [f"accept {unique_str()}", f"accept {marker} {unique_str()}"]
+    messages = [db.messages.submit_task(task, variant, group, code, unique_str(), None) for code in codes]
+    process(config, db)
+
+    while worker.analyze_pending_checks(config, db, external):
+        pass
+
+    assert len(calls) == 3
+    assert db.checks.get(messages[0].id).achievement == 1
+    assert db.checks.get(messages[0].id).analyzed
+    assert db.checks.get(messages[1].id).achievement == (1 if truncate else None)
+    assert db.checks.get(messages[1].id).analyzed == truncate
+    assert db.checks.get(messages[1].id).analysis_attempts == (0 if truncate else 1)
+    assert db.statuses.get_task_status(task, variant, group).achievements == 0b10
+
+
+@pytest.mark.parametrize("failures, achievement", [(1, 1), (worker.ANALYSIS_MAX_ATTEMPTS, None)])
+def test_failed_analysis_retried_later(
+    config: AppConfig, db: AppDatabase, monkeypatch, failures: int, achievement: int | None,
+):
+    calls = []
+
+    def analyze_solutions(analytics_path: str, task: int, codes: list[str]):
+        calls.append(codes)
+        if len(calls) <= 2 * failures:
+            raise RuntimeError("analysis failed")
+        return [(True, (1, [0.1, 0.9])) for _ in codes]
+
+    monkeypatch.setattr(worker, "analyze_solutions", analyze_solutions)
+    external = ExternalTaskManager(db.groups, db.tasks)
+    while worker.analyze_pending_checks(config, db, external):
+        pass
+    (group, variant, task) = arrange_task(db)
+    message = db.messages.submit_task(task, variant, group, f"accept {unique_str()}", unique_str(), None)
+    process(config, db)
+    calls.clear()
+
+    worker.analyze_pending_checks(config, db, external)
+    assert not db.checks.get(message.id).analyzed
+    assert worker.analyze_pending_checks(config, db, external) == 0
+
+    monkeypatch.setattr(worker, "ANALYSIS_RETRY_DELAY", 0)
+    db.checks.postpone_analysis(db.checks.get(message.id).id, 1, datetime.datetime.now())
+    while worker.analyze_pending_checks(config, db, external):
+        pass
+
+    check = db.checks.get(message.id)
+    assert check.analyzed
+    assert check.achievement == achievement
+    assert check.analysis_attempts == failures
+
+
+def test_cached_checks_skip_checker(app: Flask, db: AppDatabase, tmp_path):
+    calls = os.path.join(tmp_path, "calls.txt")
+    with open(os.path.join(tmp_path, "check_solution.py"), "w") as stream:
+        stream.write(f"""def check_solution(group, task, variant, code):
+    with open({calls!r}, "a") as stream:
+        stream.write("call\\n")
+    return True, ""
+""")
+    app.config["CORE_PATH"] = str(tmp_path)
+    config = AppConfig(app.config)
+    (group, variant, task) = arrange_task(db)
+    version = unique_str()
+
+    for code in ["main = lambda: 42\n", "main = lambda: 42\r\n\r\n"]:
+        db.messages.submit_task(task, variant, group, code, unique_str(), None)
+        process(config, db, version)
+    db.messages.submit_task(task, variant, group, "main = lambda: 42\n", unique_str(), None)
+    process(config, db)
+
+    with open(calls) as stream:
+        assert len(stream.readlines()) == 2
+    assert db.statuses.get_task_status(task, variant, group).status == Status.Checked
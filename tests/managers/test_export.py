@@ -1,5 +1,11 @@
-from tests.utils import arrange_task
+from typing import Callable
 
+from sqlalchemy import event
+from tests.utils import arrange_task, unique_str
+
+from flask import Flask
+
+from webapp import repositories
 from webapp.managers import (
     AchievementManager,
     AppConfigManager,
@@ -8,16 +14,21 @@ from webapp.managers import (
     StatusManager,
     StudentManager
 )
+from webapp.models import engines
 from webapp.repositories import AppDatabase
 
 
-def test_export(db: AppDatabase):
-    c = AppConfigManager(lambda: dict())
+def create_export_manager(db: AppDatabase, config: Callable[[], dict] = lambda: dict()) -> ExportManager:
+    c = AppConfigManager(config)
     ach = AchievementManager(c)
     ext = ExternalTaskManager(db.groups, db.tasks)
     s = StatusManager(db.tasks, db.groups, db.variants, db.statuses, c, db.seeds, db.checks, ach, ext, db.students)
     m = StudentManager(c, db.students, db.mailers)
-    e = ExportManager(db.groups, db.messages, s, db.statuses, db.variants, db.tasks, db.students, m)
+    return ExportManager(db.groups, db.messages, s, db.statuses, db.variants, db.tasks, db.students, m)
+
+
+def test_export(db: AppDatabase):
+    e = create_export_manager(db)
     (group, variant, task) = arrange_task(db)
 
     code = "main = lambda x: x**42"
@@ -27,3 +38,47 @@ def test_export(db: AppDatabase):
     assert str(m.id) in table
     assert code in table
     assert '127.0.0.1' in table
+
+
+def test_export_loads_student_emails_at_once(db: AppDatabase):
+    e = create_export_manager(db)
+    (group, variant, task) = arrange_task(db)
+    students = [db.students.create(f"{unique_str()}@example.com", unique_str()) for _ in range(3)]
+    for student in students:
+        db.messages.submit_task(task, variant, group, unique_str(), "127.0.0.1", student.id)
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = engines.get_engine(db.context.get_connection())
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        table = e.export_messages(3, ',')
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert sum("FROM students" in statement for statement in statements) == 1
+    assert all(e.manager.hide_email(student.email) in table for student in students)
+
+
+def test_student_emails_loaded_in_chunks(db: AppDatabase, monkeypatch):
+    monkeypatch.setattr(repositories, "IN_CLAUSE_SIZE", 2)
+    students = [db.students.create(f"{unique_str()}@example.com", unique_str()) for _ in range(5)]
+
+    emails = db.students.get_emails([student.id for student in students])
+
+    assert emails == {student.id: student.email for student in students}
+
+
+def test_task_status_dto_error_message(app: Flask, db: AppDatabase):
+    e = create_export_manager(db, lambda: app.config)
+    (group, variant, task) = arrange_task(db)
+    db.statuses.check(task, variant, group, unique_str(), False, "error", "127.0.0.1")
+
+    variants = e.status_manager.get_group_statuses(group, False).variants
+    statuses = [status for dto in variants for status in dto.statuses]
+
+    assert e.status_manager.get_task_status(group, variant, task, None).error_message == "error"
+    assert any(status.task == task and status.variant == variant for status in statuses)
+    assert all(status.error_message is None for status in statuses)
@@ -0,0 +1,57 @@
+import json
+import logging
+import os
+import re
+import shutil
+
+import pytest
+from tests.utils import arrange_task
+
+from flask.testing import FlaskClient
+
+from webapp.app import configure_app
+from webapp.repositories import AppDatabase
+
+
+@pytest.fixture()
+def slow_client(request, tmp_path) -> FlaskClient:
+    shutil.copy(os.path.join(os.getcwd(), "tests", "config.defaults.json"), tmp_path)
+    with open(os.path.join(tmp_path, "config.overrides.json"), "w") as stream:
+        json.dump(dict(SLOW_REQUEST_THRESHOLD=0, DEBUG=request.param), stream)
+    return configure_app(str(tmp_path)).test_client()
+
+
+def test_query_stats_reported_in_headers(db: AppDatabase, client: FlaskClient):
+    (group, _, _) = arrange_task(db)
+
+    response = client.get(f"/group/{group}")
+
+    assert int(response.headers["X-DB-Queries"]) > 0
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+
+
+@pytest.mark.parametrize("slow_client, origin", [
+    (True, r"\w+Repository\.\w+"),
+    (False, "-"),
+], indirect=["slow_client"])
+def test_slow_request_logged_with_query_origin(
+    db: AppDatabase,
+    slow_client: FlaskClient,
+    origin: str,
+    caplog: pytest.LogCaptureFixture,
+):
+    (group, _, _) = arrange_task(db)
+
+    with caplog.at_level(logging.WARNING):
+        slow_client.get(f"/group/{group}")
+
+    assert f"Slow request GET /group/{group}" in caplog.text
+    assert re.search(f" ms {origin}: SELECT ", caplog.text)
+    assert origin != "-" or "Repository." not in caplog.text
+
+
+def test_fast_request_not_logged(client: FlaskClient, caplog: pytest.LogCaptureFixture):
+    with caplog.at_level(logging.WARNING):
+        client.get("/")
+
+    assert "Slow request" not in caplog.text
@@ -87,3 +87,27 @@ def test_no_reg_anonymous_submissions(db: AppDatabase, client: FlaskClient):
 def test_empty_submission_redirect(db: AppDatabase, client: FlaskClient):
     response = client.get('/submissions')
     assert response.status_code == 302
+
+
+def test_no_reg_anonymous_submissions_pages(db: AppDatabase, client: FlaskClient):
+    group_id, variant_id, task_id = arrange_task(db)
+    session_id = token_hex(16)
+    codes = []
+    for _ in range(6):
+        code = "main = lambda: 42" + unique_str()
+        message = db.messages.submit_task(task_id, variant_id, group_id, code, "0.0.0.0", None, session_id)
+        db.checks.record_check(message.id, 0, None)
+        codes.append((message.id, code))
+
+    client.set_cookie("anonymous_identifier", session_id)
+    first = client.get('/submissions').get_data(as_text=True)
+    second = client.get(f'/submissions?after={codes[1][0]}').get_data(as_text=True)
+
+    assert "Всего решений: 6" in first
+    assert codes[0][1] not in first
+    assert codes[1][1] in first
+    assert f"?after={codes[1][0]}" in first
+    assert codes[0][1] in second
+    assert codes[1][1] not in second
+    assert f"?before={codes[0][0]}" in second
+    assert client.get(f'/submissions?after={codes[0][0]}').status_code == 302
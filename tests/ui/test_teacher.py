@@ -1,7 +1,10 @@
-from tests.utils import arrange_task, mode, teacher_login, unique_str
+import pytest
+from sqlalchemy import event
+from tests.utils import arrange_task, mode, teacher_login, unique_int, unique_str
 
 from flask.testing import FlaskClient
 
+from webapp.models import Status, engines
 from webapp.repositories import AppDatabase
 
 
@@ -95,5 +98,63 @@ def test_anonymous_submission(db: AppDatabase, client: FlaskClient):
 def test_invalid_page_redirect(db: AppDatabase, client: FlaskClient):
     teacher_login(db, client)
     gid, vid, tid = arrange_task(db)
-    response = client.get(f"/teacher/submissions/group/{gid}/variant/{vid}/task/{tid}/1")
+    response = client.get(f"/teacher/submissions/group/{gid}/variant/{vid}/task/{tid}?after=1")
     assert response.status_code == 302
+
+
+def create_block(db: AppDatabase, tid: int) -> int:
+    title = unique_str()
+    db.tasks.create_missing_blocks([dict(title=title, tasks=[tid])])
+    return next(item.id for item in db.tasks.get_blocks() if item.title == title)
+
+
+def test_verify_block_many(db: AppDatabase, client: FlaskClient):
+    teacher_login(db, client)
+    gid, vid, tid = arrange_task(db)
+    other = unique_int()
+    db.variants.create_by_ids([other])
+    block = create_block(db, tid)
+    db.statuses.check(tid, vid, gid, unique_str(), True, None, unique_str())
+    db.statuses.check(tid, other, gid, unique_str(), True, None, unique_str())
+    updates = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE task_statuses"):
+            updates.append(statement)
+
+    response = client.get("/teacher")
+    assert response.status_code == 200
+
+    engine = engines.get_engine(db.context.get_connection())
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.post("/teacher/verify-block/many", data={
+            "gid": gid,
+            "block": block,
+            "variants": [vid, other],
+        })
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert response.status_code == 302
+    assert response.headers["Location"] == f"/group/{gid}"
+    assert len(updates) == 1
+    assert db.statuses.get_task_status(tid, vid, gid).status == Status.Verified
+    assert db.statuses.get_task_status(tid, other, gid).status == Status.Verified
+
+
+@pytest.mark.parametrize("form", [
+    dict(block=None),
+    dict(gid=None),
+    dict(block=unique_int()),
+    dict(gid=unique_int()),
+])
+def test_verify_block_many_rejects_invalid_form(db: AppDatabase, client: FlaskClient, form: dict):
+    teacher_login(db, client)
+    gid, vid, tid = arrange_task(db)
+    db.statuses.check(tid, vid, gid, unique_str(), True, None, unique_str())
+    fields = {**dict(gid=gid, block=create_block(db, tid), variants=[vid]), **form}
+    data = {key: value for key, value in fields.items() if value is not None}
+
+    response = client.post("/teacher/verify-block/many", data=data)
+    assert response.status_code == 400
+    assert db.statuses.get_task_status(tid, vid, gid).status == Status.Checked
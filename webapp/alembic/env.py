@@ -8,7 +8,7 @@ from alembic import context
 config = context.config
 target_metadata = None
 
-fileConfig(config.config_file_name)
+fileConfig(config.config_file_name, disable_existing_loggers=False)
 
 
 def run_migrations_offline():
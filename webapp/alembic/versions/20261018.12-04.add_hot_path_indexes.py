@@ -0,0 +1,38 @@
+"""add_hot_path_indexes
+
+Revision ID: 69bf46e4871f
+Revises: f077131d8a66
+Create Date: 2026-10-18 12:04:51.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '69bf46e4871f'
+down_revision = 'f077131d8a66'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("ix_messages_processed_time", "messages", ["processed", "time"]),
+    ("ix_messages_group_variant_task_time", "messages", ["group", "variant", "task", "time"]),
+    ("ix_messages_student_time", "messages", ["student", "time"]),
+    ("ix_messages_session_id_time", "messages", ["session_id", "time"]),
+    ("ix_message_checks_message", "message_checks", ["message"]),
+    ("ix_task_statuses_group_variant", "task_statuses", ["group", "variant"]),
+    ("ix_students_email", "students", ["email"]),
+    ("ix_students_group_variant", "students", ["group", "variant"]),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,28 @@
+"""create_reference_versions
+
+Revision ID: 0c5d36572e13
+Revises: 69bf46e4871f
+Create Date: 2026-10-18 14:37:12.604518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0c5d36572e13'
+down_revision = '69bf46e4871f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "reference_versions",
+        sa.Column("name", sa.String, primary_key=True, nullable=False),
+        sa.Column("version", sa.Integer, nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("reference_versions")
@@ -0,0 +1,42 @@
+"""create_submission_counters
+
+Revision ID: 7ce81c27f3af
+Revises: 0c5d36572e13
+Create Date: 2026-10-18 15:52:40.118734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7ce81c27f3af'
+down_revision = '0c5d36572e13'
+branch_labels = None
+depends_on = None
+
+
+SCOPES = [
+    ("'task:' || m.\"group\" || ':' || m.variant || ':' || m.task", "1 = 1"),
+    ("'student-task:' || m.\"group\" || ':' || m.variant || ':' || m.task", "m.student IS NOT NULL"),
+    ("'student:' || m.student", "m.student IS NOT NULL"),
+    ("'session:' || m.session_id", "m.session_id IS NOT NULL"),
+]
+
+
+def upgrade():
+    op.create_table(
+        "submission_counters",
+        sa.Column("scope", sa.String, primary_key=True, nullable=False),
+        sa.Column("count", sa.Integer, nullable=False),
+    )
+    scopes = " UNION ALL ".join(
+        f"SELECT {scope} AS scope FROM message_checks c JOIN messages m ON m.id = c.message WHERE {where}"
+        for scope, where in SCOPES
+    )
+    op.execute(f"INSERT INTO submission_counters (scope, count) "
+               f"SELECT scope, count(*) FROM ({scopes}) scopes GROUP BY scope")
+
+
+def downgrade():
+    op.drop_table("submission_counters")
@@ -0,0 +1,67 @@
+"""create_code_blobs
+
+Revision ID: cba2523b07ba
+Revises: 7ce81c27f3af
+Create Date: 2026-10-18 17:05:26.730192
+
+"""
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'cba2523b07ba'
+down_revision = '7ce81c27f3af'
+branch_labels = None
+depends_on = None
+
+
+TABLES = {
+    "messages": ["id"],
+    "task_statuses": ["task", "variant", "group"],
+}
+
+
+def upgrade():
+    op.create_table(
+        "code_blobs",
+        sa.Column("hash", sa.String, primary_key=True, nullable=False),
+        sa.Column("code", sa.String, nullable=False),
+    )
+    blobs = sa.table("code_blobs", sa.column("hash"), sa.column("code"))
+    bind = op.get_bind()
+    stored = set()
+    for name, keys in TABLES.items():
+        with op.batch_alter_table(name) as bop:
+            bop.add_column(sa.Column("code_hash", sa.String, nullable=True))
+        table = sa.table(name, sa.column("code"), sa.column("code_hash"), *map(sa.column, keys))
+        hashes = []
+        for row in bind.execute(sa.select(table.c.code, *(table.c[key] for key in keys))):
+            code_hash = hashlib.sha256(row.code.encode("utf-8")).hexdigest()
+            if code_hash not in stored:
+                stored.add(code_hash)
+                bind.execute(blobs.insert().values(hash=code_hash, code=row.code))
+            hashes.append(dict(hash_value=code_hash, **{f"key_{key}": row._mapping[key] for key in keys}))
+        if hashes:
+            update = table.update() \
+                .where(*(table.c[key] == sa.bindparam(f"key_{key}") for key in keys)) \
+                .values(code_hash=sa.bindparam("hash_value"))
+            bind.execute(update, hashes)
+        with op.batch_alter_table(name) as bop:
+            bop.alter_column("code_hash", existing_type=sa.String, nullable=False)
+            bop.create_foreign_key(f"fk_{name}_code_hash", "code_blobs", ["code_hash"], ["hash"])
+            bop.drop_column("code")
+
+
+def downgrade():
+    for name in TABLES:
+        with op.batch_alter_table(name) as bop:
+            bop.add_column(sa.Column("code", sa.String, nullable=True))
+        op.execute(f"UPDATE {name} SET code = (SELECT code FROM code_blobs WHERE hash = {name}.code_hash)")
+        with op.batch_alter_table(name) as bop:
+            bop.alter_column("code", existing_type=sa.String, nullable=False)
+            bop.drop_constraint(f"fk_{name}_code_hash", type_="foreignkey")
+            bop.drop_column("code_hash")
+    op.drop_table("code_blobs")
@@ -0,0 +1,33 @@
+"""create_check_results
+
+Revision ID: c1839631a539
+Revises: cba2523b07ba
+Create Date: 2026-10-18 18:20:47.513206
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c1839631a539'
+down_revision = 'cba2523b07ba'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "check_results",
+        sa.Column("group", sa.String, primary_key=True, nullable=False),
+        sa.Column("task", sa.Integer, primary_key=True, nullable=False),
+        sa.Column("variant", sa.Integer, primary_key=True, nullable=False),
+        sa.Column("code_hash", sa.String, primary_key=True, nullable=False),
+        sa.Column("version", sa.String, primary_key=True, nullable=False),
+        sa.Column("ok", sa.Boolean, nullable=False),
+        sa.Column("output", sa.String, nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_table("check_results")
@@ -0,0 +1,69 @@
+"""compress_text_columns
+
+Revision ID: b9ef61b10c81
+Revises: c1839631a539
+Create Date: 2026-10-18 19:10:03.941576
+
+"""
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9ef61b10c81'
+down_revision = 'c1839631a539'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = [
+    ("code_blobs", "code", ["hash"]),
+    ("task_statuses", "output", ["task", "variant", "group"]),
+    ("message_checks", "output", ["id"]),
+    ("check_results", "output", ["group", "task", "variant", "code_hash", "version"]),
+]
+THRESHOLD = 256
+
+
+def compress(value: str) -> bytes:
+    data = value.encode("utf-8")
+    if len(data) >= THRESHOLD:
+        compressed = zlib.compress(data)
+        if len(compressed) < len(data):
+            return b"\x01" + compressed
+    return b"\x00" + data
+
+
+def decompress(value: bytes) -> str:
+    data = bytes(value)
+    if data[:1] == b"\x01":
+        return zlib.decompress(data[1:]).decode("utf-8")
+    return data[1:].decode("utf-8")
+
+
+def rewrite(name: str, column: str, keys: list[str], convert, type_, using: str):
+    bind = op.get_bind()
+    table = sa.table(name, sa.column(column), *map(sa.column, keys))
+    rows = [
+        {"value": convert(row[0]), **{f"key_{key}": value for key, value in zip(keys, row[1:])}}
+        for row in bind.execute(sa.select(table.c[column], *(table.c[key] for key in keys))
+                                .where(table.c[column].isnot(None)))
+    ]
+    with op.batch_alter_table(name) as bop:
+        bop.alter_column(column, type_=type_, postgresql_using=using)
+    if rows:
+        bind.execute(table.update()
+                     .where(*(table.c[key] == sa.bindparam(f"key_{key}") for key in keys))
+                     .values({column: sa.bindparam("value")}), rows)
+
+
+def upgrade():
+    for name, column, keys in COLUMNS:
+        rewrite(name, column, keys, compress, sa.LargeBinary, f"convert_to({column}, 'UTF8')")
+
+
+def downgrade():
+    for name, column, keys in COLUMNS:
+        rewrite(name, column, keys, decompress, sa.String, f"encode({column}, 'escape')")
@@ -0,0 +1,55 @@
+"""store_achievements_bitmask
+
+Revision ID: b778bcdbf85e
+Revises: b9ef61b10c81
+Create Date: 2026-10-18 20:24:51.318064
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b778bcdbf85e'
+down_revision = 'b9ef61b10c81'
+branch_labels = None
+depends_on = None
+
+
+KEYS = ["task", "variant", "group"]
+
+
+def to_mask(value: str | None) -> int:
+    return sum(1 << order for order in set(json.loads(value))) if value else 0
+
+
+def to_list(value: int | None) -> str:
+    return json.dumps([order for order in range((value or 0).bit_length()) if value >> order & 1])
+
+
+def convert(source: str, target: str, type_, convert, **options):
+    with op.batch_alter_table("task_statuses") as bop:
+        bop.add_column(sa.Column(target, type_, nullable=True))
+    bind = op.get_bind()
+    table = sa.table("task_statuses", sa.column(source), sa.column(target), *map(sa.column, KEYS))
+    rows = [
+        {"value": convert(row[0]), **{f"key_{key}": value for key, value in zip(KEYS, row[1:])}}
+        for row in bind.execute(sa.select(table.c[source], *(table.c[key] for key in KEYS)))
+    ]
+    if rows:
+        bind.execute(table.update()
+                     .where(*(table.c[key] == sa.bindparam(f"key_{key}") for key in KEYS))
+                     .values({target: sa.bindparam("value")}), rows)
+    with op.batch_alter_table("task_statuses") as bop:
+        bop.drop_column(source)
+        bop.alter_column(target, new_column_name="achievements", existing_type=type_, **options)
+
+
+def upgrade():
+    convert("achievements", "achievements_mask", sa.Integer, to_mask, nullable=False, server_default="0")
+
+
+def downgrade():
+    convert("achievements", "achievements_list", sa.String, to_list)
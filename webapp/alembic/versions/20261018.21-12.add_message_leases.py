@@ -0,0 +1,28 @@
+"""add_message_leases
+
+Revision ID: 79b8ec7ba8b3
+Revises: b778bcdbf85e
+Create Date: 2026-10-18 21:12:37.504117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '79b8ec7ba8b3'
+down_revision = 'b778bcdbf85e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("messages") as bop:
+        bop.add_column(sa.Column("claimed_by", sa.String, nullable=True))
+        bop.add_column(sa.Column("lease_until", sa.DateTime, nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("messages") as bop:
+        bop.drop_column("lease_until")
+        bop.drop_column("claimed_by")
@@ -0,0 +1,30 @@
+"""add_check_analysis_queue
+
+Revision ID: b4b10a3d88c2
+Revises: 79b8ec7ba8b3
+Create Date: 2026-10-18 22:47:15.208643
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4b10a3d88c2'
+down_revision = '79b8ec7ba8b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("message_checks") as bop:
+        bop.add_column(sa.Column("analyzed", sa.Boolean, nullable=False, server_default=sa.true()))
+    with op.batch_alter_table("message_checks") as bop:
+        bop.alter_column("analyzed", existing_type=sa.Boolean, server_default=None)
+    op.create_index("ix_message_checks_analyzed_id", "message_checks", ["analyzed", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_message_checks_analyzed_id", table_name="message_checks")
+    with op.batch_alter_table("message_checks") as bop:
+        bop.drop_column("analyzed")
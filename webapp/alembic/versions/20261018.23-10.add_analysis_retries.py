@@ -0,0 +1,30 @@
+"""add_analysis_retries
+
+Revision ID: dffd042b50b4
+Revises: b4b10a3d88c2
+Create Date: 2026-10-18 23:10:42.518907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'dffd042b50b4'
+down_revision = 'b4b10a3d88c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("message_checks") as bop:
+        bop.add_column(sa.Column("analysis_attempts", sa.Integer, nullable=False, server_default="0"))
+        bop.add_column(sa.Column("analyze_after", sa.DateTime, nullable=True))
+    with op.batch_alter_table("message_checks") as bop:
+        bop.alter_column("analysis_attempts", existing_type=sa.Integer, server_default=None)
+
+
+def downgrade():
+    with op.batch_alter_table("message_checks") as bop:
+        bop.drop_column("analyze_after")
+        bop.drop_column("analysis_attempts")
@@ -12,9 +12,10 @@ import webapp.views.api as api
 import webapp.views.student as student
 import webapp.views.teacher as teacher
 import webapp.worker as worker
-from webapp.commands import AnalyzeCmd, CmdManager, SeedCmd, migrate
+from webapp.commands import AnalyzeCmd, ClearCheckCacheCmd, CmdManager, SeedCmd, migrate
 from webapp.dto import AppConfig
-from webapp.utils import load_config_files
+from webapp.models import engines
+from webapp.utils import load_config_files, query_stats
 
 
 def configure_app(directory: str) -> Flask:
@@ -34,7 +35,9 @@ def configure_app(directory: str) -> Flask:
     app.register_blueprint(teacher.blueprint)
     app.register_blueprint(api.blueprint)
     JWTManager(app)
+    query_stats(app)
     logging.basicConfig(level=logging.DEBUG)
+    engines.configure(AppConfig(config).sqlite_pragmas)
     migrate(config["CONNECTION_STRING"])
     return app
 
@@ -42,6 +45,7 @@ def configure_app(directory: str) -> Flask:
 def configure_background_services(app: Flask) -> Flask:
     config = AppConfig(app.config)
     app.config["WORKER_PID"] = worker.start_background_worker(config)
+    app.config["ANALYTICS_PID"] = worker.start_background_analytics(config)
     app.config["MAILBOX_PID"] = mailbox.start_background_worker(config)
     return app
 
@@ -57,5 +61,5 @@ def create_app() -> Flask:
 
 
 if __name__ == "__main__":
-    cmd = CmdManager(config(), [SeedCmd, AnalyzeCmd])
+    cmd = CmdManager(config(), [SeedCmd, AnalyzeCmd, ClearCheckCacheCmd])
     cmd.run()
@@ -1,4 +1,6 @@
+import datetime
 import os
+import time
 from argparse import ArgumentParser
 from typing import Any, Callable
 
@@ -6,6 +8,7 @@ import webapp.worker as worker
 from alembic import command
 from alembic.config import Config
 from webapp.managers import AppConfigManager
+from webapp.models import engines
 from webapp.repositories import AppDatabase
 from webapp.utils import load_config_files
 
@@ -54,17 +57,29 @@ class SeedCmd:
         config = AppConfigManager(lambda: load_config_files(dir)).config
         print(f'Seeding db {config.connection_string} using core {config.core_path}...')
         groups, tasks, _ = worker.load_config(config.core_path)
+        blocks = [self.parse_block(block) for block in worker.load_blocks(config.core_path)]
         migrate(config.connection_string)
+        engines.configure(config.sqlite_pragmas)
         db = AppDatabase(lambda: config.connection_string)
-        db.groups.delete_all()
-        db.tasks.delete_all()
-        db.variants.delete_all()
-        db.groups.create_by_names(groups)
-        for task in tasks:
-            db.tasks.create(task)
-        db.variants.create_by_ids(range(0, 39 + 1))
+        with db.unit_of_work():
+            self.seed('groups', lambda: db.groups.create_missing(groups))
+            self.seed('tasks', lambda: db.tasks.create_missing(tasks))
+            self.seed('variants', lambda: db.variants.create_missing(list(range(0, 39 + 1))))
+            self.seed('task blocks', lambda: db.tasks.create_missing_blocks(blocks))
         print(f'Done seeding db {config.connection_string} using core {config.core_path}!')
 
+    def seed(self, entity: str, create: Callable[[], int]):
+        started = time.perf_counter()
+        created = create()
+        elapsed = time.perf_counter() - started
+        print(f'Seeded {created} new {entity} in {elapsed:.3f}s.')
+
+    def parse_block(self, block: dict) -> dict:
+        deadline = block.get('deadline')
+        if isinstance(deadline, str):
+            deadline = datetime.datetime.fromisoformat(deadline)
+        return {**block, 'deadline': deadline}
+
 
 class AnalyzeCmd:
     def __init__(self):
@@ -73,6 +88,7 @@ class AnalyzeCmd:
 
     def run(self, dir: str):
         config = AppConfigManager(lambda: load_config_files(dir)).config
+        engines.configure(config.sqlite_pragmas)
         db = AppDatabase(lambda: config.connection_string)
         db.statuses.clear_achievements()
         checked = db.checks.checked()
@@ -97,3 +113,15 @@ class AnalyzeCmd:
                 achievement=order,
             )
         print(f'Done analyzing {len(checked)} programs.')
+
+
+class ClearCheckCacheCmd:
+    def __init__(self):
+        self.command = "--clear-check-cache"
+        self.help = "forgets memoized check results, e.g. after the core was updated"
+
+    def run(self, dir: str):
+        config = AppConfigManager(lambda: load_config_files(dir)).config
+        engines.configure(config.sqlite_pragmas)
+        db = AppDatabase(lambda: config.connection_string)
+        print(f'Cleared {db.results.clear()} cached check results.')
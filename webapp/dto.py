@@ -3,6 +3,7 @@ from datetime import datetime
 from flask import Config
 
 from webapp.models import (
+    TRANSITIONS,
     DeadlineOverride,
     FinalSeed,
     Group,
@@ -11,6 +12,7 @@ from webapp.models import (
     Task,
     TaskBlock,
     TaskStatus,
+    Transition,
     TypeOfTask,
     Variant
 )
@@ -21,8 +23,25 @@ class AppConfig:
         self.highlight_syntax: bool = config["HIGHLIGHT_SYNTAX"]
         self.core_path: str = config["CORE_PATH"]
         self.analytics_path: str = config["ANALYTICS_PATH"]
+        self.enable_check_cache: bool = config["ENABLE_CHECK_CACHE"]
+        self.checker_version: str = config["CHECKER_VERSION"]
+        self.checker_concurrency: int = config["CHECKER_CONCURRENCY"]
+        self.checker_recycle_after: int = config["CHECKER_RECYCLE_AFTER"]
+        self.check_time_limit: int = config["CHECK_TIME_LIMIT"]
+        self.check_memory_limit: int = config["CHECK_MEMORY_LIMIT"]
+        self.claim_batch_size: int = config["CLAIM_BATCH_SIZE"]
+        self.claim_lease_seconds: int = config["CLAIM_LEASE_SECONDS"]
+        self.group_commit_size: int = config["GROUP_COMMIT_SIZE"]
+        self.analytics_batch_size: int = config["ANALYTICS_BATCH_SIZE"]
+        self.slow_request_threshold: int = config["SLOW_REQUEST_THRESHOLD"]
         self.api_token: str = config["API_TOKEN"]
         self.connection_string: str = config["CONNECTION_STRING"]
+        self.sqlite_journal_mode: str = config["SQLITE_JOURNAL_MODE"]
+        self.sqlite_synchronous: str = config["SQLITE_SYNCHRONOUS"]
+        self.sqlite_busy_timeout: int = config["SQLITE_BUSY_TIMEOUT"]
+        self.sqlite_cache_size: int = config["SQLITE_CACHE_SIZE"]
+        self.sqlite_mmap_size: int = config["SQLITE_MMAP_SIZE"]
+        self.sqlite_temp_store: str = config["SQLITE_TEMP_STORE"]
         self.task_base_path: str = config["TASK_BASE_PATH"]
         self.no_background_worker: bool = config["DISABLE_BACKGROUND_WORKER"]
         self.final_tasks: dict[str, list[int]] = config["FINAL_TASKS"]
@@ -51,6 +70,17 @@ class AppConfig:
     def registration(self) -> bool:
         return self.enable_registration
 
+    @property
+    def sqlite_pragmas(self) -> dict[str, str | int]:
+        return dict(
+            journal_mode=self.sqlite_journal_mode,
+            synchronous=self.sqlite_synchronous,
+            busy_timeout=int(self.sqlite_busy_timeout),
+            cache_size=int(self.sqlite_cache_size),
+            mmap_size=int(self.sqlite_mmap_size),
+            temp_store=self.sqlite_temp_store,
+        )
+
 
 class ExternalTaskDto:
     def __init__(self, group: int, group_title: str, task: int, variant: int, active: bool):
@@ -98,6 +128,7 @@ class TaskStatusDto:
         variant: Variant,
         task: TaskDto,
         status: TaskStatus | None,
+        output: str | None,
         external: ExternalTaskDto,
         config: AppConfig,
         achievements: list[int],
@@ -108,7 +139,7 @@ class TaskStatusDto:
         self.deadline = do.deadline if do and task.deadline and do.deadline > task.deadline else task.deadline
         self.reviewer = reviewer.email if reviewer else None
         self.reviewed_at = status.reviewed_at or '' if status else ''
-        self.earned = sum(1 for a in range(len(achievements)) if status and a in status.achievements)
+        self.earned = ((status.achievements or 0 if status else 0) & (1 << len(achievements)) - 1).bit_count()
         self.formulation = task.formulation
         self.ip = status.ip if status is not None else "-"
         self.variant = variant.id
@@ -119,7 +150,7 @@ class TaskStatusDto:
         self.checked = self.status in [Status.Checked, Status.CheckedSubmitted, Status.CheckedFailed]
         self.readonly = config.readonly
         self.achievements = self.map_achievements(status, achievements)
-        self.error_message = status.output if status else None
+        self.error_message = output
 
     @property
     def submission_url(self) -> str:
@@ -219,19 +250,13 @@ class TaskStatusDto:
 
     @property
     def can_verify(self) -> bool:
-        return self.status in [
-            Status.Checked,
-            Status.CheckedSubmitted,
-            Status.CheckedFailed,
-        ]
+        transitions, _ = TRANSITIONS[Transition.Verify]
+        return self.status in transitions
 
     @property
     def can_unverify(self) -> bool:
-        return self.status in [
-            Status.Verified,
-            Status.VerifiedSubmitted,
-            Status.VerifiedFailed,
-        ]
+        transitions, _ = TRANSITIONS[Transition.Unverify]
+        return self.status in transitions
 
     def disabled(self, teacher: bool) -> bool:
         lasting = teacher or not self.deadline or self.deadline > datetime.now()
@@ -240,8 +265,8 @@ class TaskStatusDto:
     def map_achievements(self, status: TaskStatus | None, achievements: list[int]):
         dtos = []
         for order, count in enumerate(achievements):
-            earned = status.achievements if status and status.achievements else []
-            dto = AchievementDto(order, order in earned, count)
+            earned = status.achievements or 0 if status else 0
+            dto = AchievementDto(order, bool(earned >> order & 1), count)
             dtos.append(dto)
         return dtos
 
@@ -285,6 +310,7 @@ class StudentInRatingDto:
 class SubmissionDto:
     def __init__(
         self,
+        id: int,
         status: TaskStatusDto,
         code: str,
         checked: str,
@@ -292,6 +318,7 @@ class SubmissionDto:
         ip: str,
         student: Student | None
     ):
+        self.id = id
         self.status = status
         self.code = code
         self.checked = checked
@@ -300,6 +327,29 @@ class SubmissionDto:
         self.ip = ip
 
 
+class SubmissionsPageDto:
+    def __init__(
+        self,
+        submissions: list[SubmissionDto],
+        size: int,
+        total: int,
+        after: int | None,
+        before: int | None,
+    ):
+        more = len(submissions) > size
+        if before is not None:
+            self.submissions = submissions[-size:]
+            self.newer = more
+            self.older = bool(self.submissions)
+        else:
+            self.submissions = submissions[:size]
+            self.newer = after is not None and bool(self.submissions)
+            self.older = more
+        self.total = total
+        self.first = self.submissions[0].id if self.submissions else None
+        self.last = self.submissions[-1].id if self.submissions else None
+
+
 class GroupInRatingDto:
     def __init__(
         self,
@@ -7,6 +7,7 @@ import time
 from multiprocessing import Process
 
 from webapp.dto import AppConfig
+from webapp.models import engines
 from webapp.repositories import AppDatabase
 from webapp.utils import get_exception_info
 
@@ -38,8 +39,9 @@ def get_all_senders(login: str, password: str):
         return messages
 
 
-def background_worker(login: str, password: str, connection: str):
+def background_worker(login: str, password: str, connection: str, pragmas: dict[str, str | int]):
     print(f"Starting background worker for IMAP {login} and database: {connection}")
+    engines.configure(pragmas)
     db = AppDatabase(lambda: connection)
     while True:
         try:
@@ -47,10 +49,11 @@ def background_worker(login: str, password: str, connection: str):
             length = len(senders)
             if length:
                 print(f'Received {length} emails! Processing...')
-                for email in senders:
-                    student = db.students.find_by_email(email)
-                    if student:
-                        db.students.confirm(email)
+                with db.unit_of_work():
+                    for email in senders:
+                        student = db.students.find_by_email(email)
+                        if student:
+                            db.students.confirm(email)
                 print(f'Successfully processed {length} emails.')
         except ConnectionResetError:
             print(f'IMAP connection has been reset, reconnecting...')
@@ -70,6 +73,7 @@ def start_background_worker(config: AppConfig):
         config.imap_login,
         config.imap_password,
         config.connection_string,
+        config.sqlite_pragmas,
     ))
     try:
         process.start()
@@ -15,6 +15,7 @@ from webapp.dto import (
     GroupInRatingDto,
     StudentInRatingDto,
     SubmissionDto,
+    SubmissionsPageDto,
     TaskDto,
     TaskStatusDto,
     VariantDto
@@ -34,10 +35,14 @@ from webapp.models import (
 )
 from webapp.repositories import (
     FinalSeedRepository,
+    GroupRecord,
     GroupRepository,
     MailerRepository,
     MessageCheckRepository,
+    MessageRecord,
     MessageRepository,
+    StatusRecord,
+    StudentRecord,
     StudentRepository,
     TaskRepository,
     TaskStatusRepository,
@@ -139,7 +144,7 @@ class RatingManager:
 
     @ttl_cache(duration=30, maxsize=1)
     def get_group_rating(self) -> dict[int, list[GroupInRatingDto]]:
-        def key(info: tuple[Group, int]):
+        def key(info: tuple[GroupRecord, int | None]):
             group, _ = info
             return group.id
 
@@ -156,7 +161,7 @@ class RatingManager:
 
     @ttl_cache(duration=30, maxsize=1)
     def get_rating(self) -> dict[int, list[StudentInRatingDto]]:
-        def key(info: tuple[Group, TaskStatus]):
+        def key(info: tuple[GroupRecord, StatusRecord]):
             _, status = info
             return status.group, status.variant
 
@@ -170,7 +175,8 @@ class RatingManager:
             tids = [status.task for _, status in pairs]
             if any(task.id not in tids for task in tasks):
                 continue
-            active = sum(len(status.achievements or [0]) for _, status in pairs if str(status.task) in achievements)
+            active = sum(max(status.achievements.bit_count(), 1)
+                         for _, status in pairs if str(status.task) in achievements)
             inactive = sum(1 for _, status in pairs if str(status.task) not in achievements)
             earned = active + inactive
             places.setdefault(earned, [])
@@ -227,11 +233,11 @@ class StatusManager:
             dtos.append(dto)
         return GroupDto(group, [TaskDto(task, block, seed) for task, block in tasks], dtos)
 
-    def __get_statuses(self, group: int) -> dict[tuple[int, int], TaskStatus]:
+    def __get_statuses(self, group: int) -> dict[tuple[int, int], StatusRecord]:
         statuses = self.statuses.get_by_group(group=group)
         return {(status.variant, status.task): status for status in statuses}
 
-    def __get_students(self, group: int) -> dict[int, Student]:
+    def __get_students(self, group: int) -> dict[int, StudentRecord]:
         students = self.students.get_group_students(group)
         return {student.variant: student for student in students if student.variant is not None}
 
@@ -240,7 +246,7 @@ class StatusManager:
         group: Group,
         variant: Variant,
         tasks: list[tuple[Task, TaskBlock | None]],
-        statuses: dict[tuple[int, int], TaskStatus],
+        statuses: dict[tuple[int, int], StatusRecord],
         seed: FinalSeed | None,
         config: AppConfig,
         student: Student | None,
@@ -252,7 +258,8 @@ class StatusManager:
             e = self.external.get_external_task(group, variant, task, seed, config)
             ach = self.__get_task_achievements(task.id)
             o = student and block and load_override and self.tasks.get_student_deadline_override(student.id, block.id)
-            dtos.append(TaskStatusDto(group, variant, TaskDto(task, block, seed), status, e, config, ach, None, o))
+            t = TaskDto(task, block, seed)
+            dtos.append(TaskStatusDto(group, variant, t, status, None, e, config, ach, None, o))
         return VariantDto(variant, dtos, student)
 
     def __get_task_achievements(self, task: int) -> list[int]:
@@ -292,25 +299,37 @@ class StatusManager:
         seed = self.seeds.get_final_seed(gid)
         ext = self.external.get_external_task(group, variant, task, seed, self.config.config)
         do = student and block and self.tasks.get_student_deadline_override(student.id, block.id)
-        return TaskStatusDto(group, variant, TaskDto(task, block, seed), status, ext, config, ach, reviewer, do)
-
-    def get_submissions_statuses_by_info(self, gid: int, vid: int, tid: int, skip: int, take: int):
-        checks = self.checks.get_by_task(gid, vid, tid, skip, take, self.config.config.enable_registration)
-        return [self.__get_submissions(check, message, student) for check, message, student in checks]
-
-    def count_submissions_by_info(self, group: int, variant: int, task: int) -> int:
-        return self.checks.count_submissions_by_info(group, variant, task, self.config.config.enable_registration)
-
-    def get_submissions_statuses(self, student: Student, skip: int, take: int) -> list[SubmissionDto]:
-        checks = self.checks.get_by_student(student, skip, take)
-        return [self.__get_submissions(check, message, None) for check, message in checks]
-
-    def get_anonymous_submissions_statuses(self, session_id: str, skip: int, take: int) -> list[SubmissionDto]:
-        checks = self.checks.get_by_session_id(session_id, skip, take)
-        return [self.__get_submissions(check, message, None) for check, message in checks]
+        t = TaskDto(task, block, seed)
+        output = status.output if status else None
+        return TaskStatusDto(group, variant, t, status, output, ext, config, ach, reviewer, do)
+
+    def get_submissions_statuses_by_info(
+        self, gid: int, vid: int, tid: int, size: int, after: int | None, before: int | None,
+    ) -> SubmissionsPageDto:
+        registration = self.config.config.enable_registration
+        checks = self.checks.get_by_task(gid, vid, tid, size + 1, registration, after, before)
+        submissions = [self.__get_submissions(check, message, student) for check, message, student in checks]
+        total = self.checks.count_submissions_by_info(gid, vid, tid, registration)
+        return SubmissionsPageDto(submissions, size, total, after, before)
+
+    def get_submissions_statuses(
+        self, student: Student, size: int, after: int | None, before: int | None,
+    ) -> SubmissionsPageDto:
+        checks = self.checks.get_by_student(student, size + 1, after, before)
+        submissions = [self.__get_submissions(check, message, None) for check, message in checks]
+        total = self.checks.count_student_submissions(student)
+        return SubmissionsPageDto(submissions, size, total, after, before)
+
+    def get_anonymous_submissions_statuses(
+        self, session_id: str, size: int, after: int | None, before: int | None,
+    ) -> SubmissionsPageDto:
+        checks = self.checks.get_by_session_id(session_id, size + 1, after, before)
+        submissions = [self.__get_submissions(check, message, None) for check, message in checks]
+        total = self.checks.count_session_id_submissions(session_id)
+        return SubmissionsPageDto(submissions, size, total, after, before)
 
     def __get_submissions(self, check: MessageCheck, message: Message, student: Student | None):
-        return SubmissionDto(self.__get_task_status_dto(message.group, message.variant, message.task, TaskStatus(
+        status = self.__get_task_status_dto(message.group, message.variant, message.task, TaskStatus(
             task=message.task,
             variant=message.variant,
             group=message.group,
@@ -319,8 +338,9 @@ class StatusManager:
             ip=message.ip,
             output=check.output,
             status=check.status,
-            achievements=[]
-        ), [], None, None), message.code, check.time, message.time, message.ip, student)
+            achievements=0
+        ), [], None, None)
+        return SubmissionDto(message.id, status, message.code, check.time, message.time, message.ip, student)
 
 
 class HomeManager:
@@ -507,8 +527,9 @@ class ExportManager:
             table.append(row)
         return table
 
-    def __create_messages_table(self, messages: list[Message], group_titles: dict[int, str]) -> list[list[str]]:
+    def __create_messages_table(self, messages: list[MessageRecord], group_titles: dict[int, str]) -> list[list[str]]:
         rows = [["ID", "Время", "Группа", "Задача", "Вариант", "IP", "Отправитель", "Код"]]
+        emails = self.students.get_emails(list({message.student for message in messages if message.student}))
         for message in messages:
             gt = group_titles[message.group]
             time = message.time.strftime("%Y-%m-%d %H:%M:%S")
@@ -518,14 +539,14 @@ class ExportManager:
             ip = message.ip
             id = message.id
             sid = message.student
-            email = self.manager.hide_email(self.students.get_by_id(sid).email) if sid else None
+            email = self.manager.hide_email(emails[sid]) if sid in emails else None
             rows.append([id, time, gt, task, variant, ip, email, code])
         return rows
 
     def __create_exam_table(self, group_id: int) -> list[list[str]]:
+        group = self.status_manager.get_group_statuses(group_id, False)
         header = ['Сдающая группа', 'Вариант']
-        tasks = self.tasks.get_all()
-        for task in tasks:
+        for task in group.tasks:
             id = task.id + 1
             header += [
                 f'№{id} Статус',
@@ -536,12 +557,10 @@ class ExportManager:
             ]
         header.append('Решено задач')
         rows = []
-        for variant in self.variants.get_all():
-            group_title = self.groups.get_by_id(group_id).title
-            row = [group_title, variant.id + 1]
+        for variant in group.variants:
+            row = [group.title, variant.id + 1]
             score = 0
-            for task in tasks:
-                info = self.status_manager.get_task_status(group_id, variant.id, task.id, None)
+            for info in variant.statuses:
                 status = 1 if info.status.value == 2 else 0
                 row.append(status)
                 row.append(info.external.group_title)
@@ -560,7 +579,7 @@ class ExportManager:
             group_titles[group.id] = group.title
         return group_titles
 
-    def __get_latest_messages(self, count: int | None) -> list[Message]:
+    def __get_latest_messages(self, count: int | None) -> list[MessageRecord]:
         if count is None:
             return self.messages.get_all()
         return self.messages.get_latest(count)
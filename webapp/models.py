@@ -1,9 +1,16 @@
 import enum
-import json
+import hashlib
+import os
+import sys
+import threading
+import time
+import zlib
+from contextvars import ContextVar
 
 import sqlalchemy as sa
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import column_property, declarative_base, sessionmaker
 
 
 class IntEnum(sa.TypeDecorator):
@@ -23,21 +30,34 @@ class IntEnum(sa.TypeDecorator):
         return self._enumtype(value)
 
 
-class JsonArray(sa.TypeDecorator):
-    impl = sa.Text
+class CompressedText(sa.TypeDecorator):
+    impl = sa.LargeBinary
     cache_ok = True
 
+    PLAIN = b"\x00"
+    ZLIB = b"\x01"
+
+    def __init__(self, threshold: int = 256, *args, **kwargs):
+        super(CompressedText, self).__init__(*args, **kwargs)
+        self.threshold = threshold
+
     def process_bind_param(self, value, dialect):
-        if not value:
-            return '[]'
-        if isinstance(value, list):
-            return json.dumps(value)
-        raise ValueError("Bad value type for JSON array.")
+        if value is None:
+            return None
+        data = value.encode("utf-8")
+        if len(data) >= self.threshold:
+            compressed = zlib.compress(data)
+            if len(compressed) < len(data):
+                return self.ZLIB + compressed
+        return self.PLAIN + data
 
     def process_result_value(self, value, dialect):
-        if not value:
-            return []
-        return json.loads(value)
+        if value is None:
+            return None
+        data = bytes(value)
+        if data[:1] == self.ZLIB:
+            return zlib.decompress(data[1:]).decode("utf-8")
+        return data[1:].decode("utf-8")
 
 
 class Status(enum.IntEnum):
@@ -52,6 +72,57 @@ class Status(enum.IntEnum):
     VerifiedFailed = 9
 
 
+class Transition(enum.Enum):
+    Accept = 0
+    Reject = 1
+    Submit = 2
+    Verify = 3
+    Unverify = 4
+
+
+TRANSITIONS: dict[Transition, tuple[dict[Status, Status], Status | None]] = {
+    Transition.Accept: ({
+        Status.Checked: Status.Checked,
+        Status.CheckedFailed: Status.Checked,
+        Status.CheckedSubmitted: Status.Checked,
+        Status.Verified: Status.Verified,
+        Status.VerifiedFailed: Status.Verified,
+        Status.VerifiedSubmitted: Status.Verified,
+    }, Status.Checked),
+    Transition.Reject: ({
+        Status.Checked: Status.CheckedFailed,
+        Status.CheckedFailed: Status.CheckedFailed,
+        Status.CheckedSubmitted: Status.CheckedFailed,
+        Status.Verified: Status.VerifiedFailed,
+        Status.VerifiedFailed: Status.VerifiedFailed,
+        Status.VerifiedSubmitted: Status.VerifiedFailed,
+    }, Status.Failed),
+    Transition.Submit: ({
+        Status.Checked: Status.CheckedSubmitted,
+        Status.CheckedFailed: Status.CheckedSubmitted,
+        Status.CheckedSubmitted: Status.CheckedSubmitted,
+        Status.Verified: Status.VerifiedSubmitted,
+        Status.VerifiedFailed: Status.VerifiedSubmitted,
+        Status.VerifiedSubmitted: Status.VerifiedSubmitted,
+    }, Status.Submitted),
+    Transition.Verify: ({
+        Status.Checked: Status.Verified,
+        Status.CheckedFailed: Status.VerifiedFailed,
+        Status.CheckedSubmitted: Status.VerifiedSubmitted,
+    }, None),
+    Transition.Unverify: ({
+        Status.Verified: Status.Checked,
+        Status.VerifiedFailed: Status.CheckedFailed,
+        Status.VerifiedSubmitted: Status.CheckedSubmitted,
+    }, None),
+}
+
+
+def get_next_status(transition: Transition, status: Status | None) -> Status | None:
+    transitions, fallback = TRANSITIONS[transition]
+    return transitions.get(status, status if fallback is None else fallback)
+
+
 class TypeOfTask(enum.IntEnum):
     Static = 0
     Random = 1
@@ -60,11 +131,128 @@ class TypeOfTask(enum.IntEnum):
 Base = declarative_base()
 
 
-def create_session_maker(connection_string: str) -> sessionmaker:
-    engine = create_engine(connection_string)
-    Base.metadata.create_all(engine)
-    factory = sessionmaker(bind=engine)
-    return factory
+REPOSITORIES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "repositories.py")
+
+
+def get_query_origin() -> str:
+    origin = "-"
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_code.co_filename == REPOSITORIES and "self" in frame.f_locals:
+            origin = f"{type(frame.f_locals['self']).__name__}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return origin
+
+
+class QueryStats:
+    def __init__(self, size: int = 3, origins: bool = False):
+        self.size = size
+        self.origins = origins
+        self.count = 0
+        self.duration = 0.0
+        self.slowest: list[tuple[float, str, str]] = []
+
+    def record(self, duration: float, statement: str):
+        self.count += 1
+        self.duration += duration
+        if len(self.slowest) < self.size or duration > self.slowest[-1][0]:
+            self.slowest.append((duration, get_query_origin() if self.origins else "-", statement))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[self.size:]
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+    def begin(self, origins: bool = False) -> QueryStats:
+        stats = QueryStats(origins=origins)
+        self.stats.set(stats)
+        return stats
+
+    def end(self) -> QueryStats | None:
+        stats = self.stats.get()
+        self.stats.set(None)
+        return stats
+
+    def listen(self, engine: Engine):
+        event.listen(engine, "before_cursor_execute", self.__before_execute)
+        event.listen(engine, "after_cursor_execute", self.__after_execute)
+
+    def __before_execute(self, connection, cursor, statement, parameters, context, executemany):
+        if self.stats.get() is not None:
+            connection.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def __after_execute(self, connection, cursor, statement, parameters, context, executemany):
+        started = connection.info.get("query_started")
+        if not started:
+            return
+        duration = time.perf_counter() - started.pop()
+        stats = self.stats.get()
+        if stats is not None:
+            stats.record(duration, statement)
+
+
+queries = QueryRecorder()
+
+
+class EngineRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.engines: dict[str, Engine] = dict()
+        self.makers: dict[str, sessionmaker] = dict()
+        self.pragmas: dict[str, str | int] = dict(foreign_keys="ON")
+
+    def configure(self, pragmas: dict[str, str | int]):
+        pragmas = dict(foreign_keys="ON", **pragmas)
+        if pragmas != self.pragmas:
+            self.dispose()
+            self.pragmas = pragmas
+
+    def get_engine(self, connection_string: str) -> Engine:
+        with self.lock:
+            return self.__get_or_create(connection_string)[0]
+
+    def get_session_maker(self, connection_string: str) -> sessionmaker:
+        with self.lock:
+            return self.__get_or_create(connection_string)[1]
+
+    def reset_after_fork(self):
+        self.lock = threading.Lock()
+        for engine in self.engines.values():
+            engine.dispose(close=False)
+        self.engines.clear()
+        self.makers.clear()
+
+    def dispose(self):
+        with self.lock:
+            for engine in self.engines.values():
+                engine.dispose()
+            self.engines.clear()
+            self.makers.clear()
+
+    def __get_or_create(self, connection_string: str) -> tuple[Engine, sessionmaker]:
+        if connection_string not in self.engines:
+            engine = create_engine(connection_string)
+            if engine.dialect.name == "sqlite":
+                event.listen(engine, "connect", self.__create_pragma_listener(dict(self.pragmas)))
+            queries.listen(engine)
+            self.engines[connection_string] = engine
+            self.makers[connection_string] = sessionmaker(bind=engine, expire_on_commit=False)
+        return self.engines[connection_string], self.makers[connection_string]
+
+    def __create_pragma_listener(self, pragmas: dict[str, str | int]):
+        def apply_pragmas(connection, record):
+            cursor = connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+        return apply_pragmas
+
+
+engines = EngineRegistry()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=engines.reset_after_fork)
 
 
 class Group(Base):
@@ -104,19 +292,38 @@ class Variant(Base):
     id = sa.Column("id", sa.Integer, primary_key=True, nullable=False, autoincrement=True)
 
 
+class CodeBlob(Base):
+    __tablename__ = "code_blobs"
+    hash = sa.Column("hash", sa.String, primary_key=True, nullable=False)
+    code = sa.Column("code", CompressedText(), nullable=False)
+
+
+def hash_code(code: str) -> str:
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def blob_code(code_hash: sa.Column):
+    code = sa.select(CodeBlob.code).where(CodeBlob.hash == code_hash).scalar_subquery()
+    return column_property(code, expire_on_flush=False)
+
+
 class TaskStatus(Base):
     __tablename__ = "task_statuses"
     task = sa.Column("task", sa.Integer, sa.ForeignKey("tasks.id"), primary_key=True, nullable=False)
     variant = sa.Column("variant", sa.Integer, sa.ForeignKey("variants.id"), primary_key=True, nullable=False)
     group = sa.Column("group", sa.Integer, sa.ForeignKey("groups.id"), primary_key=True, nullable=False)
     time = sa.Column("time", sa.DateTime, nullable=False)
-    code = sa.Column("code", sa.String, nullable=False)
+    code_hash = sa.Column("code_hash", sa.String, sa.ForeignKey("code_blobs.hash"), nullable=False)
+    code = blob_code(code_hash)
     ip = sa.Column("ip", sa.String, nullable=False)
-    output = sa.Column("output", sa.String, nullable=True)
+    output = sa.Column("output", CompressedText(), nullable=True)
     status = sa.Column("status", IntEnum(Status), nullable=False)
-    achievements = sa.Column("achievements", JsonArray, nullable=True)
+    achievements = sa.Column("achievements", sa.Integer, nullable=False, default=0)
     reviewer = sa.Column("reviewer", sa.Integer, sa.ForeignKey("students.id"), nullable=True)
     reviewed_at = sa.Column("reviewed_at", sa.DateTime, nullable=True)
+    __table_args__ = (
+        sa.Index("ix_task_statuses_group_variant", "group", "variant"),
+    )
 
 
 class Message(Base):
@@ -126,11 +333,20 @@ class Message(Base):
     variant = sa.Column("variant", sa.Integer, sa.ForeignKey("variants.id"), nullable=False)
     group = sa.Column("group", sa.Integer, sa.ForeignKey("groups.id"), nullable=False)
     time = sa.Column("time", sa.DateTime, nullable=False)
-    code = sa.Column("code", sa.String, nullable=False)
+    code_hash = sa.Column("code_hash", sa.String, sa.ForeignKey("code_blobs.hash"), nullable=False)
+    code = blob_code(code_hash)
     ip = sa.Column("ip", sa.String, nullable=False)
     session_id = sa.Column("session_id", sa.String, nullable=True)
     processed = sa.Column("processed", sa.Boolean, nullable=False)
     student = sa.Column("student", sa.Integer, sa.ForeignKey("students.id"), nullable=True)
+    claimed_by = sa.Column("claimed_by", sa.String, nullable=True)
+    lease_until = sa.Column("lease_until", sa.DateTime, nullable=True)
+    __table_args__ = (
+        sa.Index("ix_messages_processed_time", "processed", "time"),
+        sa.Index("ix_messages_group_variant_task_time", "group", "variant", "task", "time"),
+        sa.Index("ix_messages_student_time", "student", "time"),
+        sa.Index("ix_messages_session_id_time", "session_id", "time"),
+    )
 
 
 class MessageCheck(Base):
@@ -139,8 +355,15 @@ class MessageCheck(Base):
     message = sa.Column("message", sa.Integer, sa.ForeignKey("messages.id"), nullable=False)
     time = sa.Column('time', sa.DateTime, nullable=False)
     status = sa.Column('status', sa.Integer, nullable=False)
-    output = sa.Column('output', sa.String, nullable=True)
+    output = sa.Column('output', CompressedText(), nullable=True)
     achievement = sa.Column('achievement', sa.Integer, nullable=True)
+    analyzed = sa.Column('analyzed', sa.Boolean, nullable=False, default=True)
+    analysis_attempts = sa.Column('analysis_attempts', sa.Integer, nullable=False, default=0)
+    analyze_after = sa.Column('analyze_after', sa.DateTime, nullable=True)
+    __table_args__ = (
+        sa.Index("ix_message_checks_message", "message"),
+        sa.Index("ix_message_checks_analyzed_id", "analyzed", "id"),
+    )
 
 
 class FinalSeed(Base):
@@ -162,6 +385,10 @@ class Student(Base):
     unconfirmed_hash = sa.Column("unconfirmed_hash", sa.String, nullable=True)
     blocked = sa.Column("blocked", sa.Boolean, nullable=False)
     teacher = sa.Column("teacher", sa.Boolean, nullable=True)
+    __table_args__ = (
+        sa.Index("ix_students_email", "email"),
+        sa.Index("ix_students_group_variant", "group", "variant"),
+    )
 
 
 class Mailer(Base):
@@ -181,3 +408,26 @@ class BlockedExternalSession(Base):
     __tablename__ = "blocked_external_sessions"
     sid = sa.Column("sid", sa.String, primary_key=True, nullable=False)
     time = sa.Column("time", sa.DateTime, nullable=False)
+
+
+class ReferenceVersion(Base):
+    __tablename__ = "reference_versions"
+    name = sa.Column("name", sa.String, primary_key=True, nullable=False)
+    version = sa.Column("version", sa.Integer, nullable=False)
+
+
+class SubmissionCounter(Base):
+    __tablename__ = "submission_counters"
+    scope = sa.Column("scope", sa.String, primary_key=True, nullable=False)
+    count = sa.Column("count", sa.Integer, nullable=False)
+
+
+class CheckResult(Base):
+    __tablename__ = "check_results"
+    group = sa.Column("group", sa.String, primary_key=True, nullable=False)
+    task = sa.Column("task", sa.Integer, primary_key=True, nullable=False)
+    variant = sa.Column("variant", sa.Integer, primary_key=True, nullable=False)
+    code_hash = sa.Column("code_hash", sa.String, primary_key=True, nullable=False)
+    version = sa.Column("version", sa.String, primary_key=True, nullable=False)
+    ok = sa.Column("ok", sa.Boolean, nullable=False)
+    output = sa.Column("output", CompressedText(), nullable=True)
@@ -1,62 +1,338 @@
 import datetime
+import functools
+import threading
 import uuid
-from typing import Callable
-
-from sqlalchemy import desc, exists, func, literal, null, select, text
-from sqlalchemy.orm import Session
+from contextvars import ContextVar
+from typing import Any, Callable, NamedTuple
+
+from sqlalchemy import (
+    Insert,
+    Row,
+    Select,
+    Update,
+    case,
+    desc,
+    exists,
+    func,
+    insert,
+    literal,
+    null,
+    select,
+    tuple_,
+    update
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Query, Session, aliased, defer
+from sqlalchemy.orm.attributes import set_committed_value
 
 from webapp.models import (
+    TRANSITIONS,
     AllowedIp,
+    Base,
     BlockedExternalSession,
+    CheckResult,
+    CodeBlob,
     DeadlineOverride,
     FinalSeed,
     Group,
     Mailer,
     Message,
     MessageCheck,
+    ReferenceVersion,
     Status,
     Student,
+    SubmissionCounter,
     Task,
     TaskBlock,
     TaskStatus,
+    Transition,
     TypeOfTask,
     Variant,
-    create_session_maker
+    engines,
+    get_next_status,
+    hash_code
 )
 
 
+RATED = [
+    Status.Checked,
+    Status.CheckedFailed,
+    Status.CheckedSubmitted,
+    Status.Verified,
+    Status.VerifiedFailed,
+    Status.VerifiedSubmitted,
+]
+
+
+def transition_case(transition: Transition):
+    transitions, fallback = TRANSITIONS[transition]
+    return case(transitions, value=TaskStatus.status, else_=TaskStatus.status if fallback is None else fallback)
+
+
+PENDING_CHANNEL = "pending_messages"
+ANALYSIS_CHANNEL = "pending_analysis"
+IN_CLAUSE_SIZE = 500
+
+
+def dialect_insert(session: Session, model: type[Base]) -> Insert:
+    match session.get_bind().dialect.name:
+        case "postgresql":
+            return postgresql.insert(model)
+        case _:
+            return sqlite.insert(model)
+
+
+class GroupRecord(NamedTuple):
+    id: int
+    title: str
+    external: str | None
+
+
+class StatusRecord(NamedTuple):
+    task: int
+    variant: int
+    group: int
+    time: datetime.datetime
+    ip: str
+    status: Status
+    achievements: int
+    reviewer: int | None
+    reviewed_at: datetime.datetime | None
+
+
+class StudentRecord(NamedTuple):
+    id: int
+    email: str
+    group: str | None
+    variant: int | None
+    teacher: bool | None
+
+
+class MessageRecord(NamedTuple):
+    id: int
+    task: int
+    variant: int
+    group: int
+    time: datetime.datetime
+    code: str
+    ip: str
+    session_id: str | None
+    processed: bool
+    student: int | None
+
+
+def columns(model: type[Base], record: type[NamedTuple]) -> list:
+    return [getattr(model, field) for field in record._fields]
+
+
+def records(session: Session, record: type[NamedTuple], statement: Select) -> list:
+    return list(map(record._make, session.execute(statement)))
+
+
+def store_code(session: Session, code: str) -> str:
+    code_hash = hash_code(code)
+    upsert = dialect_insert(session, CodeBlob).values(hash=code_hash, code=code)
+    session.execute(upsert.on_conflict_do_nothing(index_elements=[CodeBlob.hash]))
+    return code_hash
+
+
+def listing(model: type[Base]) -> list:
+    return [defer(getattr(model, column)) for column in ("code", "output") if hasattr(model, column)]
+
+
+def seek(query: Query, take: int, after: int | None = None, before: int | None = None) -> list:
+    key = tuple_(Message.time, Message.id)
+    if before is not None:
+        cursor = select(Message.time, Message.id).filter_by(id=before).scalar_subquery()
+        return query.filter(key > cursor).order_by(Message.time, Message.id).limit(take).all()[::-1]
+    if after is not None:
+        cursor = select(Message.time, Message.id).filter_by(id=after).scalar_subquery()
+        query = query.filter(key < cursor)
+    return query.order_by(desc(Message.time), desc(Message.id)).limit(take).all()
+
+
+def submission_scopes(message: Message) -> list[str]:
+    task = f"{message.group}:{message.variant}:{message.task}"
+    scopes = [f"task:{task}"]
+    if message.student is not None:
+        scopes += [f"student:{message.student}", f"student-task:{task}"]
+    if message.session_id is not None:
+        scopes.append(f"session:{message.session_id}")
+    return scopes
+
+
 class DbContext:
     def __init__(self, session: Session):
         self.session = session
+        self.shared = False
+        self.failed = False
 
     def __enter__(self) -> Session:
-        self.session.execute(text("PRAGMA foreign_keys=ON"))
         return self.session
 
     def __exit__(self, exc_type: type[BaseException] | None, exc_val, trace):
-        if exc_type is not None:
-            self.session.rollback()
+        if not self.shared:
+            self.end(exc_type is not None)
+        elif exc_type is not None:
+            self.failed = True
         else:
-            self.session.commit()
-        self.session.close()
+            self.flush()
+
+    def flush(self):
+        try:
+            self.session.flush()
+        except BaseException:
+            self.failed = True
+            raise
+
+    def end(self, failed: bool):
+        try:
+            if failed or self.failed:
+                self.session.rollback()
+            else:
+                self.session.commit()
+        finally:
+            self.session.close()
+
+
+class UnitOfWork:
+    def __init__(self, db: "DbContextManager"):
+        self.db = db
+        self.owner = False
+
+    def __enter__(self) -> "UnitOfWork":
+        self.owner = self.db.begin()
+        return self
+
+    def __exit__(self, exc_type: type[BaseException] | None, exc_val, trace):
+        if self.owner:
+            self.db.end(exc_type is not None)
+        elif exc_type is not None:
+            self.db.fail()
+
+
+class ReferenceCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.versions: dict[str, int] = dict()
+        self.entries: dict[tuple, Any] = dict()
+
+    def refresh(self, session: Session):
+        versions = dict(session.execute(select(ReferenceVersion.name, ReferenceVersion.version)).tuples().all())
+        with self.lock:
+            stale = {name for name in versions.keys() | self.versions.keys()
+                     if versions.get(name) != self.versions.get(name)}
+            self.versions = versions
+            self.__invalidate(stale)
+
+    def get(self, session: Session, tables: tuple[str, ...], key: tuple, load: Callable[[], Any]) -> Any:
+        with self.lock:
+            if key in self.entries:
+                return self.__copy(self.entries[key])
+            stamp = [self.versions.get(table) for table in tables]
+        value = load()
+        for instance in self.__instances(value):
+            if instance in session:
+                session.expunge(instance)
+        with self.lock:
+            if stamp == [self.versions.get(table) for table in tables]:
+                self.entries[key] = value
+        return self.__copy(value)
+
+    def bump(self, session: Session, table: str):
+        upsert = dialect_insert(session, ReferenceVersion).values(name=table, version=1)
+        session.execute(upsert.on_conflict_do_update(
+            index_elements=[ReferenceVersion.name],
+            set_=dict(version=ReferenceVersion.version + 1)))
+        with self.lock:
+            self.versions[table] = -1
+            self.__invalidate({table})
+
+    def __invalidate(self, tables: set[str]):
+        if tables:
+            self.entries = {key: value for key, value in self.entries.items() if tables.isdisjoint(key[0])}
+
+    def __instances(self, value: Any) -> list[Base]:
+        if isinstance(value, Base):
+            return [value]
+        if isinstance(value, (list, tuple, Row)):
+            return [instance for item in value for instance in self.__instances(item)]
+        return []
+
+    def __copy(self, value: Any) -> Any:
+        return list(value) if isinstance(value, list) else value
+
+
+def reference(*tables: str):
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            key = (tables, self.db.get_connection(), method.__qualname__, args, tuple(sorted(kwargs.items())))
+            return self.db.get_reference(tables, key, lambda: method(self, *args, **kwargs))
+        return wrapper
+    return decorator
 
 
 class DbContextManager:
     def __init__(self, get_connection: Callable[[], str]):
         self.get_connection = get_connection
+        self.unit: ContextVar[DbContext | None] = ContextVar(f"unit_of_work_{id(self)}", default=None)
+        self.cache = ReferenceCache()
 
     def create_session(self) -> DbContext:
+        unit = self.unit.get()
+        if unit is not None:
+            return unit
         connection_string = self.get_connection()
-        maker = create_session_maker(connection_string)
-        session = maker(expire_on_commit=False)
+        maker = engines.get_session_maker(connection_string)
+        session = maker()
         context = DbContext(session)
         return context
 
+    def begin(self) -> bool:
+        if self.unit.get() is not None:
+            return False
+        context = self.create_session()
+        context.shared = True
+        self.unit.set(context)
+        try:
+            self.cache.refresh(context.session)
+        except BaseException:
+            self.end(failed=True)
+            raise
+        return True
+
+    def get_reference(self, tables: tuple[str, ...], key: tuple, load: Callable[[], Any]) -> Any:
+        unit = self.unit.get()
+        if unit is None:
+            return load()
+        return self.cache.get(unit.session, tables, key, load)
+
+    def bump(self, session: Session, *tables: str):
+        for table in tables:
+            self.cache.bump(session, table)
+
+    def fail(self):
+        unit = self.unit.get()
+        if unit is not None:
+            unit.failed = True
+
+    def end(self, failed: bool = False):
+        unit = self.unit.get()
+        if unit is None:
+            return
+        self.unit.set(None)
+        unit.end(failed)
+
+    def unit_of_work(self) -> UnitOfWork:
+        return UnitOfWork(self)
+
 
 class GroupRepository:
     def __init__(self, db: DbContextManager):
         self.db = db
 
+    @reference("groups", "final_seeds")
     def get_active(self) -> list[Group]:
         with self.db.create_session() as session:
             return session.query(Group) \
@@ -64,6 +340,7 @@ class GroupRepository:
                 .filter(FinalSeed.active.is_(True)) \
                 .all()
 
+    @reference("groups")
     def get_all(self) -> list[Group]:
         with self.db.create_session() as session:
             return session.query(Group).all()
@@ -75,6 +352,7 @@ class GroupRepository:
                 .all()
             return groups
 
+    @reference("groups")
     def get_by_id(self, group_id: int) -> Group:
         with self.db.create_session() as session:
             group = session.get_one(Group, group_id)
@@ -82,22 +360,37 @@ class GroupRepository:
 
     def rename(self, group_id: int, title: str, external: str):
         with self.db.create_session() as session:
+            self.db.bump(session, "groups")
             session.query(Group) \
                 .filter_by(id=group_id) \
                 .update(dict(title=title, external=external))
 
     def create_by_names(self, names: list[str]):
-        for name in names:
-            self.create(name)
+        if not names:
+            return
+        with self.db.create_session() as session:
+            self.db.bump(session, "groups")
+            session.execute(insert(Group), [dict(title=name) for name in names])
+
+    def create_missing(self, names: list[str]) -> int:
+        with self.db.create_session() as session:
+            existing = set(session.scalars(select(Group.title)))
+            missing = [name for name in dict.fromkeys(names) if name not in existing]
+            rows = [dict(title=name) for name in missing]
+            if rows and session.execute(insert(Group.__table__), rows).rowcount > 0:
+                self.db.bump(session, "groups")
+            return len(missing)
 
     def create(self, name: str) -> Group:
         with self.db.create_session() as session:
+            self.db.bump(session, "groups")
             group = Group(title=name)
             session.add(group)
             return group
 
     def delete_all(self):
         with self.db.create_session() as session:
+            self.db.bump(session, "groups")
             session.query(Group).delete()
 
 
@@ -138,11 +431,13 @@ class TaskRepository:
                         DeadlineOverride.block == block) \
                 .first()
 
+    @reference("tasks")
     def get_all(self) -> list[Task]:
         with self.db.create_session() as session:
             tasks = session.query(Task).all()
             return tasks
 
+    @reference("tasks")
     def get_all_with_blocks(self) -> list[tuple[Task, TaskBlock | None]]:
         with self.db.create_session() as session:
             tasks = session.query(Task, TaskBlock) \
@@ -167,11 +462,13 @@ class TaskRepository:
                 .first()
             return wip is None
 
+    @reference("tasks")
     def get_blocks(self) -> list[TaskBlock]:
         with self.db.create_session() as session:
             blocks = session.query(TaskBlock).all()
             return blocks
 
+    @reference("tasks")
     def get_all_in_block(self, block: int) -> list[Task]:
         with self.db.create_session() as session:
             tasks = session.query(Task) \
@@ -179,11 +476,13 @@ class TaskRepository:
                 .all()
             return tasks
 
+    @reference("tasks")
     def get_by_id(self, task_id: int) -> Task:
         with self.db.create_session() as session:
             task = session.get_one(Task, task_id)
             return task
 
+    @reference("tasks")
     def get_by_id_with_block(self, task_id: int) -> tuple[Task, TaskBlock | None]:
         with self.db.create_session() as session:
             pair = session.query(Task, TaskBlock) \
@@ -194,11 +493,41 @@ class TaskRepository:
 
     def create(self, id: int, type: TypeOfTask = TypeOfTask.Static):
         with self.db.create_session() as session:
+            self.db.bump(session, "tasks")
             group = Task(id=id, type=type)
             session.add(group)
 
+    def create_missing(self, ids: list[int], type: TypeOfTask = TypeOfTask.Static) -> int:
+        with self.db.create_session() as session:
+            existing = set(session.scalars(select(Task.id)))
+            missing = [id for id in dict.fromkeys(ids) if id not in existing]
+            rows = [dict(id=id, type=type) for id in missing]
+            if rows and session.execute(insert(Task.__table__), rows).rowcount > 0:
+                self.db.bump(session, "tasks")
+            return len(missing)
+
+    def create_missing_blocks(self, blocks: list[dict]) -> int:
+        with self.db.create_session() as session:
+            existing = set(session.scalars(select(TaskBlock.title)))
+            missing = [dict(
+                title=block["title"],
+                weight=block.get("weight", 1),
+                deadline=block.get("deadline"),
+            ) for block in blocks if block["title"] not in existing]
+            inserted = session.execute(insert(TaskBlock.__table__), missing).rowcount if missing else 0
+            ids = dict(session.execute(select(TaskBlock.title, TaskBlock.id)).tuples().all())
+            current = dict(session.execute(select(Task.id, Task.block)).tuples().all())
+            assignments = [dict(id=task, block=ids[block["title"]]) for block in blocks for task in block["tasks"]
+                           if task in current and current[task] != ids[block["title"]]]
+            if assignments:
+                session.execute(update(Task), assignments)
+            if inserted > 0 or assignments:
+                self.db.bump(session, "tasks")
+            return len(missing)
+
     def delete_all(self):
         with self.db.create_session() as session:
+            self.db.bump(session, "tasks")
             session.query(Task).delete()
 
 
@@ -206,11 +535,13 @@ class VariantRepository:
     def __init__(self, db: DbContextManager):
         self.db = db
 
+    @reference("variants")
     def get_all(self) -> list[Variant]:
         with self.db.create_session() as session:
             variants = session.query(Variant).all()
             return variants
 
+    @reference("variants")
     def get_by_id(self, variant_id: int) -> Variant:
         with self.db.create_session() as session:
             variant = session.get(Variant, variant_id)
@@ -218,12 +549,23 @@ class VariantRepository:
 
     def create_by_ids(self, ids: list[int]):
         with self.db.create_session() as session:
+            self.db.bump(session, "variants")
             for variant_id in ids:
                 task = Variant(id=variant_id)
                 session.add(task)
 
+    def create_missing(self, ids: list[int]) -> int:
+        with self.db.create_session() as session:
+            existing = set(session.scalars(select(Variant.id)))
+            missing = [id for id in dict.fromkeys(ids) if id not in existing]
+            rows = [dict(id=id) for id in missing]
+            if rows and session.execute(insert(Variant.__table__), rows).rowcount > 0:
+                self.db.bump(session, "variants")
+            return len(missing)
+
     def delete_all(self):
         with self.db.create_session() as session:
+            self.db.bump(session, "variants")
             session.query(Variant).delete()
 
     def get_student_variants(self, student: int, group: int) -> list[int]:
@@ -241,48 +583,33 @@ class TaskStatusRepository:
 
     def get_all(self) -> list[TaskStatus]:
         with self.db.create_session() as session:
-            statuses = session.query(TaskStatus).all()
+            statuses = session.query(TaskStatus).options(*listing(TaskStatus)).all()
             return statuses
 
-    def get_by_group(self, group: int) -> list[TaskStatus]:
+    def get_by_group(self, group: int) -> list[StatusRecord]:
         with self.db.create_session() as session:
-            statuses = session.query(TaskStatus) \
-                .filter_by(group=group) \
-                .all()
-            return statuses
+            return records(session, StatusRecord, select(*columns(TaskStatus, StatusRecord)).filter_by(group=group))
 
-    def get_group_rating(self) -> list[tuple[Group, int]]:
+    def get_group_rating(self) -> list[tuple[GroupRecord, int | None]]:
         with self.db.create_session() as session:
             tasks = session.query(Task).count()
-            variants = session \
-                .query(TaskStatus.group, TaskStatus.variant) \
-                .filter((TaskStatus.status == Status.Checked) |
-                        (TaskStatus.status == Status.CheckedFailed) |
-                        (TaskStatus.status == Status.CheckedSubmitted) |
-                        (TaskStatus.status == Status.Verified) |
-                        (TaskStatus.status == Status.VerifiedFailed) |
-                        (TaskStatus.status == Status.VerifiedSubmitted)) \
+            variants = select(TaskStatus.group, TaskStatus.variant) \
+                .filter(TaskStatus.status.in_(RATED)) \
                 .group_by(TaskStatus.variant, TaskStatus.group) \
                 .having(func.count() >= tasks) \
                 .subquery()
-            scores = session \
-                .query(Group, variants.c.variant) \
-                .join(variants, Group.id == variants.c.group, isouter=True) \
-                .all()
-            return scores
+            scores = select(*columns(Group, GroupRecord), variants.c.variant) \
+                .join(variants, Group.id == variants.c.group, isouter=True)
+            return [(GroupRecord._make(row[:-1]), row[-1]) for row in session.execute(scores)]
 
-    def get_rating(self) -> list[tuple[Group, TaskStatus]]:
+    def get_rating(self) -> list[tuple[GroupRecord, StatusRecord]]:
+        size = len(GroupRecord._fields)
         with self.db.create_session() as session:
-            statuses = session.query(Group, TaskStatus) \
+            statuses = select(*columns(Group, GroupRecord), *columns(TaskStatus, StatusRecord)) \
                 .join(TaskStatus, TaskStatus.group == Group.id) \
-                .filter((TaskStatus.status == Status.Checked) |
-                        (TaskStatus.status == Status.CheckedFailed) |
-                        (TaskStatus.status == Status.CheckedSubmitted) |
-                        (TaskStatus.status == Status.Verified) |
-                        (TaskStatus.status == Status.VerifiedFailed) |
-                        (TaskStatus.status == Status.VerifiedSubmitted)) \
-                .all()
-            return statuses
+                .filter(TaskStatus.status.in_(RATED))
+            return [(GroupRecord._make(row[:size]), StatusRecord._make(row[size:]))
+                    for row in session.execute(statuses)]
 
     def get_task_status(self, task: int, variant: int, group: int) -> TaskStatus | None:
         with self.db.create_session() as session:
@@ -305,108 +632,108 @@ class TaskStatusRepository:
         group: int,
         achievement: int,
         output: str | None = None,
+        code: str | None = None,
     ):
-        existing = self.get_task_status(task, variant, group)
-        if not existing:
-            return
-        achievements = list(set(existing.achievements + [achievement]))
-        values = dict(achievements=achievements)
-        if output is not None:
+        values = dict(achievements=TaskStatus.achievements.bitwise_or(1 << achievement))
+        if output is not None and code is not None:
+            report = literal(output, TaskStatus.output.type)
+            values["output"] = case((TaskStatus.code_hash == hash_code(code), report), else_=TaskStatus.output)
+        elif output is not None:
             values["output"] = output
         with self.db.create_session() as session:
             session.query(TaskStatus) \
                 .filter_by(task=task, variant=variant, group=group) \
-                .update(values)
+                .update(values, synchronize_session=False)
 
     def clear_achievements(self):
         with self.db.create_session() as session:
             session.query(TaskStatus) \
-                .update(dict(achievements=None))
+                .update(dict(achievements=0))
 
     def check(self, task: int, variant: int, group: int, code: str, ok: bool, output: str, ip: str):
-        ts = self.get_task_status(task, variant, group)
-        match (ok, ts and ts.status):
-            case (True, Status.Checked | Status.CheckedFailed | Status.CheckedSubmitted):
-                status = Status.Checked
-            case (True, Status.Verified | Status.VerifiedFailed | Status.VerifiedSubmitted):
-                status = Status.Verified
-            case (True, _):
-                status = Status.Checked
-            case (False, Status.Checked | Status.CheckedFailed | Status.CheckedSubmitted):
-                status = Status.CheckedFailed
-            case (False, Status.Verified | Status.VerifiedFailed | Status.VerifiedSubmitted):
-                status = Status.VerifiedFailed
-            case (False, _):
-                status = Status.Failed
-        return self.create_or_update(task, variant, group, code, status, output, ip, ts and ts.reviewer)
+        transition = Transition.Accept if ok else Transition.Reject
+        return self.transit(task, variant, group, code, output, ip, transition)
 
     def submit_task(self, task: int, variant: int, group: int, code: str, ip: str) -> TaskStatus:
-        ts = self.get_task_status(task, variant, group)
-        match ts and ts.status:
-            case Status.Checked | Status.CheckedFailed | Status.CheckedSubmitted:
-                status = Status.CheckedSubmitted
-            case Status.Verified | Status.VerifiedFailed | Status.VerifiedSubmitted:
-                status = Status.VerifiedSubmitted
-            case _:
-                status = Status.Submitted
-        return self.create_or_update(task, variant, group, code, status, None, ip, ts and ts.reviewer)
-
-    def verify(self, task: int, variant: int, group: int, reviewer: int):
-        ts = self.get_task_status(task, variant, group)
-        match ts.status:
-            case Status.Checked:
-                status = Status.Verified
-            case Status.CheckedFailed:
-                status = Status.VerifiedFailed
-            case Status.CheckedSubmitted:
-                status = Status.VerifiedSubmitted
-            case _:
-                status = ts.status
-        return self.create_or_update(task, variant, group, ts.code, status, ts.output, ts.ip, reviewer)
-
-    def unverify(self, task: int, variant: int, group: int, reviewer: int):
-        ts = self.get_task_status(task, variant, group)
-        match ts.status:
-            case Status.Verified:
-                status = Status.Checked
-            case Status.VerifiedFailed:
-                status = Status.CheckedFailed
-            case Status.VerifiedSubmitted:
-                status = Status.CheckedSubmitted
-            case _:
-                status = ts.status
-        return self.create_or_update(task, variant, group, ts.code, status, ts.output, ts.ip, reviewer)
-
-    def create_or_update(self, task: int, variant: int, group: int, code: str,
-                         status: int, output: str, ip: str, reviewer: int | None):
+        return self.transit(task, variant, group, code, None, ip, Transition.Submit)
+
+    def verify(self, task: int, variant: int, group: int, reviewer: int) -> TaskStatus | None:
+        return self.review(task, variant, group, reviewer, Transition.Verify)
+
+    def unverify(self, task: int, variant: int, group: int, reviewer: int) -> TaskStatus | None:
+        return self.review(task, variant, group, reviewer, Transition.Unverify)
+
+    def transit(self, task: int, variant: int, group: int, code: str,
+                output: str | None, ip: str, transition: Transition) -> TaskStatus:
         now = datetime.datetime.now()
-        reviewed_at = now if reviewer is not None else None
         with self.db.create_session() as session:
-            query = session.query(TaskStatus).filter_by(task=task, variant=variant, group=group)
-            if query.count():
-                query.update(dict(
-                    code=code,
-                    status=status,
-                    output=output,
-                    ip=ip,
-                    time=now,
-                    reviewer=reviewer,
-                    reviewed_at=reviewed_at))
-                updated: TaskStatus = query.one()
-                return updated
-            model = TaskStatus(
-                code=code,
-                status=status,
-                output=output,
-                ip=ip,
-                time=now,
-                reviewer=reviewer,
-                reviewed_at=reviewed_at,
+            values = dict(code_hash=store_code(session, code), output=output, ip=ip, time=now)
+            upsert = dialect_insert(session, TaskStatus).values(
                 task=task,
                 variant=variant,
-                group=group)
-            session.add(model)
-            return model
+                group=group,
+                status=get_next_status(transition, None),
+                **values)
+            updates = {name: upsert.excluded[name] for name in values}
+            updates["status"] = transition_case(transition)
+            updates["reviewed_at"] = case((TaskStatus.reviewer.isnot(None), upsert.excluded.time), else_=null())
+            return self.__upsert(session, upsert, updates, code)
+
+    def review(self, task: int, variant: int, group: int, reviewer: int, transition: Transition) -> TaskStatus | None:
+        now = datetime.datetime.now()
+        with self.db.create_session() as session:
+            statement = update(TaskStatus) \
+                .where(TaskStatus.task == task, TaskStatus.variant == variant, TaskStatus.group == group) \
+                .values(status=transition_case(transition), time=now, reviewer=reviewer, reviewed_at=now)
+            reviewed = self.__returning(session, statement, populate_existing=True, synchronize_session=False)
+            return reviewed[0] if reviewed else None
+
+    def verify_many(self, tasks: list[int], variants: list[int], group: int, reviewer: int) -> list[TaskStatus]:
+        return self.review_many(tasks, variants, group, reviewer, Transition.Verify)
+
+    def unverify_many(self, tasks: list[int], variants: list[int], group: int, reviewer: int) -> list[TaskStatus]:
+        return self.review_many(tasks, variants, group, reviewer, Transition.Unverify)
+
+    def review_many(
+        self,
+        tasks: list[int],
+        variants: list[int],
+        group: int,
+        reviewer: int,
+        transition: Transition,
+    ) -> list[TaskStatus]:
+        transitions, _ = TRANSITIONS[transition]
+        now = datetime.datetime.now()
+        with self.db.create_session() as session:
+            statement = update(TaskStatus) \
+                .where(TaskStatus.task.in_(tasks),
+                       TaskStatus.variant.in_(variants),
+                       TaskStatus.group == group,
+                       TaskStatus.status.in_(list(transitions))) \
+                .values(status=transition_case(transition), time=now, reviewer=reviewer, reviewed_at=now)
+            return self.__returning(session, statement, populate_existing=True, synchronize_session=False)
+
+    def __upsert(self, session: Session, upsert: Insert, updates: dict, code: str) -> TaskStatus:
+        statement = upsert \
+            .on_conflict_do_update(
+                index_elements=[TaskStatus.task, TaskStatus.variant, TaskStatus.group],
+                set_=updates)
+        [upserted] = self.__returning(session, statement, code, populate_existing=True)
+        return upserted
+
+    def __returning(
+        self, session: Session, statement: Insert | Update, code: str | None = None, **options,
+    ) -> list[TaskStatus]:
+        statuses = session.scalars(statement.returning(TaskStatus), execution_options=options).all()
+        if code is not None:
+            codes = {hash_code(code): code}
+        else:
+            hashes = {status.code_hash for status in statuses}
+            blobs = select(CodeBlob.hash, CodeBlob.code).filter(CodeBlob.hash.in_(hashes))
+            codes = dict(session.execute(blobs).tuples().all())
+        for status in statuses:
+            set_committed_value(status, "code", codes[status.code_hash])
+        return list(statuses)
 
 
 class MessageRepository:
@@ -430,28 +757,27 @@ class MessageRepository:
                 task=task,
                 variant=variant,
                 group=group,
+                code_hash=store_code(session, code),
                 code=code,
                 ip=ip,
                 student=student,
                 session_id=session_id
             )
             session.add(message)
+            if session.get_bind().dialect.name == "postgresql":
+                session.execute(select(func.pg_notify(PENDING_CHANNEL, "")))
             return message
 
-    def get_all(self) -> list[Message]:
+    def get_all(self) -> list[MessageRecord]:
         with self.db.create_session() as session:
-            messages = session.query(Message) \
-                .order_by(Message.time.desc()) \
-                .all()
-            return messages
+            return records(session, MessageRecord, select(*columns(Message, MessageRecord))
+                           .order_by(Message.time.desc()))
 
-    def get_latest(self, count: int) -> list[Message]:
+    def get_latest(self, count: int) -> list[MessageRecord]:
         with self.db.create_session() as session:
-            latest_messages = session.query(Message) \
-                .order_by(Message.time.desc()) \
-                .limit(count) \
-                .all()
-            return latest_messages
+            return records(session, MessageRecord, select(*columns(Message, MessageRecord))
+                           .order_by(Message.time.desc())
+                           .limit(count))
 
     def get_pending_messages(self) -> list[Message]:
         with self.db.create_session() as session:
@@ -461,6 +787,55 @@ class MessageRepository:
                 .all()
             return pending
 
+    def claim_next(self, count: int, worker: str, lease: int) -> list[Message]:
+        now = datetime.datetime.now()
+        pending, earlier = aliased(Message), aliased(Message)
+        blocked = exists().where(
+            earlier.group == pending.group,
+            earlier.variant == pending.variant,
+            earlier.task == pending.task,
+            earlier.processed.is_(False),
+            tuple_(earlier.time, earlier.id) < tuple_(pending.time, pending.id),
+            earlier.lease_until >= now,
+        )
+        candidates = select(pending.id) \
+            .where(pending.processed.is_(False)) \
+            .where((pending.lease_until.is_(None)) | (pending.lease_until < now)) \
+            .where(~blocked) \
+            .order_by(pending.time.asc(), pending.id.asc()) \
+            .limit(count) \
+            .with_for_update(skip_locked=True)
+        with self.db.create_session() as session:
+            claim = update(Message) \
+                .where(Message.id.in_(candidates)) \
+                .values(claimed_by=worker, lease_until=now + datetime.timedelta(seconds=lease)) \
+                .returning(Message.id)
+            ids = session.execute(claim).scalars().all()
+            if not ids:
+                return []
+            return session.query(Message) \
+                .filter(Message.id.in_(ids)) \
+                .order_by(Message.time.asc(), Message.id.asc()) \
+                .all()
+
+    def get_targets(self, messages: list[int]) -> dict[int, tuple[Group, Variant, Task, FinalSeed | None]]:
+        with self.db.create_session() as session:
+            rows = session.query(Message.id, Group, Variant, Task, FinalSeed) \
+                .join(Group, Group.id == Message.group) \
+                .join(Variant, Variant.id == Message.variant) \
+                .join(Task, Task.id == Message.task) \
+                .outerjoin(FinalSeed, FinalSeed.group == Message.group) \
+                .filter(Message.id.in_(messages)) \
+                .all()
+            return {row[0]: tuple(row[1:]) for row in rows}
+
+    def release(self, message: int, worker: str, delay: int = 0):
+        lease_until = datetime.datetime.now() + datetime.timedelta(seconds=delay)
+        with self.db.create_session() as session:
+            session.query(Message) \
+                .filter_by(id=message, claimed_by=worker) \
+                .update(dict(lease_until=lease_until))
+
     def get_next_pending_message(self) -> Message | None:
         with self.db.create_session() as session:
             message = session.query(Message) \
@@ -506,65 +881,45 @@ class MessageCheckRepository:
                 .filter(MessageCheck.status.in_([Status.Checked, Status.Verified])) \
                 .all()
 
-    def get_by_student(self, student: Student, skip: int, take: int) -> list[tuple[MessageCheck, Message]]:
+    def get_by_student(
+        self, student: Student, take: int, after: int | None = None, before: int | None = None,
+    ) -> list[tuple[MessageCheck, Message]]:
         with self.db.create_session() as session:
-            return session.query(MessageCheck, Message) \
+            query = session.query(MessageCheck, Message) \
                 .join(Message, Message.id == MessageCheck.message) \
-                .filter(Message.student == student.id) \
-                .order_by(desc(Message.time)) \
-                .offset(skip) \
-                .limit(take) \
-                .all()
+                .filter(Message.student == student.id)
+            return seek(query, take, after, before)
 
-    def get_by_session_id(self, session_id: str, skip: int, take: int) -> list[tuple[MessageCheck, Message]]:
+    def get_by_session_id(
+        self, session_id: str, take: int, after: int | None = None, before: int | None = None,
+    ) -> list[tuple[MessageCheck, Message]]:
         with self.db.create_session() as session:
-            return session.query(MessageCheck, Message) \
+            query = session.query(MessageCheck, Message) \
                 .join(Message, Message.id == MessageCheck.message) \
-                .filter(Message.session_id == session_id) \
-                .order_by(desc(Message.time)) \
-                .offset(skip) \
-                .limit(take) \
-                .all()
+                .filter(Message.session_id == session_id)
+            return seek(query, take, after, before)
 
     def count_student_submissions(self, student: Student) -> int:
-        with self.db.create_session() as session:
-            return session.query(MessageCheck, Message) \
-                .join(Message, Message.id == MessageCheck.message) \
-                .filter(Message.student == student.id) \
-                .count()
+        return self.__count(f"student:{student.id}")
 
     def count_session_id_submissions(self, session_id: str) -> int:
-        with self.db.create_session() as session:
-            return session.query(MessageCheck, Message) \
-                .join(Message, Message.id == MessageCheck.message) \
-                .filter(Message.session_id == session_id) \
-                .count()
+        return self.__count(f"session:{session_id}")
 
-    def get_by_task(self, group: int, variant: int, task: int, skip: int, take: int, registration: bool):
+    def get_by_task(
+        self, group: int, variant: int, task: int, take: int, registration: bool,
+        after: int | None = None, before: int | None = None,
+    ):
         with self.db.create_session() as session:
             query = session \
                 .query(MessageCheck, Message, Student if registration else null()) \
                 .join(Message, Message.id == MessageCheck.message)
             if registration:
                 query = query.join(Student, Student.id == Message.student)
-            return query \
-                .filter(Message.group == group, Message.variant == variant, Message.task == task) \
-                .order_by(desc(Message.time)) \
-                .offset(skip) \
-                .limit(take) \
-                .all()
+            query = query.filter(Message.group == group, Message.variant == variant, Message.task == task)
+            return seek(query, take, after, before)
 
     def count_submissions_by_info(self, group: int, variant: int, task: int, registration: bool):
-        with self.db.create_session() as session:
-            query = session \
-                .query(MessageCheck, Message, Student if registration else null()) \
-                .join(Message, Message.id == MessageCheck.message)
-            if registration:
-                query = query.join(Student, Student.id == Message.student)
-            return query \
-                .filter(Message.group == group, Message.variant == variant, Message.task == task) \
-                .order_by(desc(Message.time)) \
-                .count()
+        return self.__count(f"{'student-task' if registration else 'task'}:{group}:{variant}:{task}")
 
     def record_analytics(self, check: int, achievement: int, output: str | None = None):
         values = dict(achievement=achievement)
@@ -580,6 +935,7 @@ class MessageCheckRepository:
         message: int,
         status: TaskStatus,
         output: str | None,
+        analyze: bool = False,
     ) -> MessageCheck:
         with self.db.create_session() as session:
             check = MessageCheck(
@@ -587,15 +943,55 @@ class MessageCheckRepository:
                 message=message,
                 status=status,
                 output=output,
+                analyzed=not analyze,
             )
             session.add(check)
+            self.__increment(session, session.get(Message, message))
+            if analyze and session.get_bind().dialect.name == "postgresql":
+                session.execute(select(func.pg_notify(ANALYSIS_CHANNEL, "")))
             return check
 
+    def get_unanalyzed(self, count: int) -> list[tuple[MessageCheck, Message]]:
+        now = datetime.datetime.now()
+        with self.db.create_session() as session:
+            return session.query(MessageCheck, Message) \
+                .join(Message, Message.id == MessageCheck.message) \
+                .filter(MessageCheck.analyzed.is_(False)) \
+                .filter((MessageCheck.analyze_after.is_(None)) | (MessageCheck.analyze_after <= now)) \
+                .order_by(MessageCheck.id.asc()) \
+                .limit(count) \
+                .all()
+
+    def mark_as_analyzed(self, checks: list[int]):
+        with self.db.create_session() as session:
+            session.query(MessageCheck) \
+                .filter(MessageCheck.id.in_(checks)) \
+                .update(dict(analyzed=True), synchronize_session=False)
+
+    def postpone_analysis(self, check: int, attempts: int, retry_at: datetime.datetime | None):
+        with self.db.create_session() as session:
+            session.query(MessageCheck) \
+                .filter_by(id=check) \
+                .update(dict(analysis_attempts=attempts, analyze_after=retry_at, analyzed=retry_at is None))
+
+    def __increment(self, session: Session, message: Message):
+        upsert = dialect_insert(session, SubmissionCounter)
+        session.execute(
+            upsert.on_conflict_do_update(
+                index_elements=[SubmissionCounter.scope],
+                set_=dict(count=SubmissionCounter.count + 1)),
+            [dict(scope=scope, count=1) for scope in submission_scopes(message)])
+
+    def __count(self, scope: str) -> int:
+        with self.db.create_session() as session:
+            return session.scalar(select(SubmissionCounter.count).filter_by(scope=scope)) or 0
+
 
 class FinalSeedRepository:
     def __init__(self, db: DbContextManager):
         self.db = db
 
+    @reference("final_seeds")
     def get_final_seed(self, group: int) -> FinalSeed | None:
         with self.db.create_session() as session:
             return session.query(FinalSeed) \
@@ -605,22 +1001,26 @@ class FinalSeedRepository:
     def begin_final_test(self, group: int):
         seed = str(uuid.uuid4())
         with self.db.create_session() as session:
+            self.db.bump(session, "final_seeds")
             session.add(FinalSeed(group=group, seed=seed, active=True))
 
     def continue_final_test(self, group: int):
         with self.db.create_session() as session:
+            self.db.bump(session, "final_seeds")
             session.query(FinalSeed) \
                 .filter_by(group=group) \
                 .update(dict(active=True))
 
     def end_final_test(self, group: int):
         with self.db.create_session() as session:
+            self.db.bump(session, "final_seeds")
             session.query(FinalSeed) \
                 .filter_by(group=group) \
                 .update(dict(active=False))
 
     def delete_final_seed(self, group: int):
         with self.db.create_session() as session:
+            self.db.bump(session, "final_seeds")
             session.query(FinalSeed) \
                 .filter_by(group=group) \
                 .delete()
@@ -634,17 +1034,24 @@ class StudentRepository:
         with self.db.create_session() as session:
             return session.query(Student).all()
 
-    def get_group_students(self, group_id: int) -> list[Student]:
+    def get_group_students(self, group_id: int) -> list[StudentRecord]:
         with self.db.create_session() as session:
-            return session.query(Student) \
-                .filter(Student.group == group_id) \
-                .all()
+            return records(session, StudentRecord, select(*columns(Student, StudentRecord))
+                           .filter(Student.group == group_id))
 
     def get_by_id(self, id: int) -> Student | None:
         with self.db.create_session() as session:
             student = session.get(Student, id)
             return student
 
+    def get_emails(self, ids: list[int]) -> dict[int, str]:
+        emails = dict()
+        with self.db.create_session() as session:
+            for start in range(0, len(ids), IN_CLAUSE_SIZE):
+                chunk = select(Student.id, Student.email).where(Student.id.in_(ids[start:start + IN_CLAUSE_SIZE]))
+                emails.update(session.execute(chunk).tuples().all())
+        return emails
+
     def get_by_external_email(self, email: str, provider: str) -> Student | None:
         with self.db.create_session() as session:
             return session.query(Student) \
@@ -747,6 +1154,7 @@ class MailerRepository:
     def __init__(self, db: DbContextManager):
         self.db = db
 
+    @reference("mailers")
     def exists(self, domain: str) -> bool:
         with self.db.create_session() as session:
             mailer = session.query(Mailer) \
@@ -754,6 +1162,7 @@ class MailerRepository:
                 .first()
             return bool(mailer)
 
+    @reference("mailers")
     def get_domains(self) -> list[str]:
         with self.db.create_session() as session:
             mailers: list[Mailer] = session.query(Mailer).all()
@@ -762,6 +1171,7 @@ class MailerRepository:
     def create(self, domain: str) -> Mailer:
         domain = domain.lower()
         with self.db.create_session() as session:
+            self.db.bump(session, "mailers")
             mailer = Mailer(domain=domain)
             session.add(mailer)
             return mailer
@@ -799,9 +1209,43 @@ class AllowedIpRepository:
                 .delete()
 
 
+class CheckResultRepository:
+    def __init__(self, db: DbContextManager):
+        self.db = db
+
+    def get(self, group: str, task: int, variant: int, code_hash: str, version: str) -> CheckResult | None:
+        with self.db.create_session() as session:
+            return session.get(CheckResult, (group, task, variant, code_hash, version))
+
+    def get_many(self, keys: list[tuple[str, int, int, str, str]]) -> dict[tuple, CheckResult]:
+        if not keys:
+            return dict()
+        with self.db.create_session() as session:
+            results = session.query(CheckResult) \
+                .filter(tuple_(CheckResult.group, CheckResult.task, CheckResult.variant,
+                               CheckResult.code_hash, CheckResult.version).in_(keys)) \
+                .all()
+            return {(result.group, result.task, result.variant, result.code_hash, result.version): result
+                    for result in results}
+
+    def record(self, group: str, task: int, variant: int, code_hash: str, version: str, ok: bool, output: str | None):
+        with self.db.create_session() as session:
+            upsert = dialect_insert(session, CheckResult).values(
+                group=group, task=task, variant=variant, code_hash=code_hash, version=version, ok=ok, output=output)
+            session.execute(upsert.on_conflict_do_update(
+                index_elements=[CheckResult.group, CheckResult.task, CheckResult.variant,
+                                CheckResult.code_hash, CheckResult.version],
+                set_=dict(ok=upsert.excluded.ok, output=upsert.excluded.output)))
+
+    def clear(self) -> int:
+        with self.db.create_session() as session:
+            return session.query(CheckResult).delete()
+
+
 class AppDatabase:
     def __init__(self, get_connection: Callable[[], str]):
         db = DbContextManager(get_connection)
+        self.context = db
         self.groups = GroupRepository(db)
         self.variants = VariantRepository(db)
         self.tasks = TaskRepository(db)
@@ -812,3 +1256,7 @@ class AppDatabase:
         self.students = StudentRepository(db)
         self.mailers = MailerRepository(db)
         self.ips = AllowedIpRepository(db)
+        self.results = CheckResultRepository(db)
+
+    def unit_of_work(self) -> UnitOfWork:
+        return self.context.unit_of_work()
@@ -11,10 +11,11 @@ from typing import Callable
 from flask_jwt_extended import get_jwt, get_jwt_identity, unset_jwt_cookies, verify_jwt_in_request
 from jwt import PyJWTError
 
-from flask import Request, redirect
+from flask import Blueprint, Flask, Request, Response, g, redirect, request
 
-from webapp.models import Student
-from webapp.repositories import StudentRepository
+from webapp.dto import AppConfig
+from webapp.models import Student, queries
+from webapp.repositories import AppDatabase, StudentRepository
 
 
 def ttl_cache(duration: int, maxsize=128, typed=False):
@@ -30,6 +31,52 @@ def ttl_cache(duration: int, maxsize=128, typed=False):
     return decorator
 
 
+def unit_of_work(blueprint: Blueprint, db: AppDatabase):
+    @blueprint.before_request
+    def begin_unit_of_work():
+        db.context.begin()
+
+    @blueprint.after_request
+    def commit_unit_of_work(response: Response) -> Response:
+        db.context.end()
+        return response
+
+    @blueprint.teardown_request
+    def rollback_unit_of_work(error: BaseException | None):
+        db.context.end(failed=True)
+
+
+def query_stats(app: Flask):
+    config = AppConfig(app.config)
+    origins = app.debug or app.testing
+
+    @app.before_request
+    def begin_query_stats():
+        g.request_started = time.perf_counter()
+        queries.begin(origins)
+
+    @app.after_request
+    def report_query_stats(response: Response) -> Response:
+        stats = queries.end()
+        if stats is None:
+            return response
+        elapsed = (time.perf_counter() - g.request_started) * 1000
+        duration = stats.duration * 1000
+        response.headers["X-DB-Queries"] = str(stats.count)
+        response.headers["Server-Timing"] = \
+            f'db;dur={duration:.2f};desc="{stats.count} queries", app;dur={elapsed:.2f}'
+        if elapsed >= config.slow_request_threshold:
+            slowest = "".join(f"\n  {seconds * 1000:.2f} ms {origin}: {' '.join(statement.split())[:200]}"
+                              for seconds, origin, statement in stats.slowest)
+            app.logger.warning(f"Slow request {request.method} {request.path}: {elapsed:.2f} ms, "
+                               f"{stats.count} queries, {duration:.2f} ms in database{slowest}")
+        return response
+
+    @app.teardown_request
+    def end_query_stats(error: BaseException | None):
+        queries.end()
+
+
 def logout(config, path, auth_redirect=True):
     def wrapper(function):
         @wraps(function)
@@ -5,12 +5,13 @@ from flask import jsonify, request
 from webapp.forms import CodeLength
 from webapp.managers import AchievementManager, AppConfigManager, ExternalTaskManager, GroupManager, StatusManager
 from webapp.repositories import AppDatabase
-from webapp.utils import get_exception_info, get_real_ip
+from webapp.utils import get_exception_info, get_real_ip, unit_of_work
 
 
 blueprint = Blueprint("api", __name__, url_prefix="/api/v1")
 config = AppConfigManager(lambda: app.config)
 db = AppDatabase(lambda: config.config.connection_string)
+unit_of_work(blueprint, db)
 
 ach = AchievementManager(config)
 ext = ExternalTaskManager(db.groups, db.tasks)
@@ -91,4 +92,5 @@ def submit_task(gid: int, vid: int, tid: int):
 @blueprint.errorhandler(Exception)
 def handle_view_errors(e):
     print(get_exception_info())
+    db.context.end(failed=True)
     return jsonify(dict(error=500))
@@ -6,7 +6,6 @@ import requests
 from authlib.integrations.requests_client import OAuth2Session
 from flask_jwt_extended import create_access_token, set_access_cookies, unset_jwt_cookies
 from flask_jwt_extended.exceptions import JWTExtendedException
-from flask_paginate import Pagination
 from jwt import PyJWKClient, decode
 from jwt.exceptions import PyJWTError
 
@@ -27,12 +26,13 @@ from webapp.managers import (
 )
 from webapp.models import Student
 from webapp.repositories import AppDatabase
-from webapp.utils import authorize, get_exception_info, get_greeting_msg, get_real_ip, logout
+from webapp.utils import authorize, get_exception_info, get_greeting_msg, get_real_ip, logout, unit_of_work
 
 
 blueprint = Blueprint("student", __name__)
 config = AppConfigManager(lambda: app.config)
 db = AppDatabase(lambda: config.config.connection_string)
+unit_of_work(blueprint, db)
 jwks = PyJWKClient(str(), timeout=3, cache_keys=True, cache_jwk_set=True)
 
 ach = AchievementManager(config)
@@ -73,45 +73,32 @@ def dashboard(student: Student | None):
     )
 
 
-@blueprint.route("/submissions", methods=["GET"], defaults={'page': 0})
-@blueprint.route("/submissions/<int:page>", methods=["GET"])
+@blueprint.route("/submissions", methods=["GET"])
 @authorize(db.students)
-def submissions(student: Student | None, page: int):
+def submissions(student: Student | None):
     size = 5
+    after = request.args.get("after", type=int)
+    before = request.args.get("before", type=int)
     session = request.cookies.get("anonymous_identifier")
     if not config.config.enable_registration:
         if not session:
             return redirect('/')
-        submissions = statuses.get_anonymous_submissions_statuses(session, (page - 1) * size, size)
-        count = db.checks.count_session_id_submissions(session)
+        page = statuses.get_anonymous_submissions_statuses(session, size, after, before)
     elif student is not None:
-        submissions = statuses.get_submissions_statuses(student, (page - 1) * size, size)
-        count = db.checks.count_student_submissions(student)
+        page = statuses.get_submissions_statuses(student, size, after, before)
     else:
         return redirect('/')
-    if not submissions and page > 0:
-        return redirect(f"/submissions/{page - 1}")
-    pagination = Pagination(
-        page=page,
-        per_page=size,
-        total=count,
-        search=False,
-        prev_label="<",
-        next_label=">",
-        inner_window=2,
-        outer_window=0,
-        css_framework="bootstrap5",
-    )
+    if not page.submissions and (after is not None or before is not None):
+        return redirect("/submissions")
     return render_template(
         "student/submissions.jinja",
-        submissions=submissions,
+        submissions=page.submissions,
         registration=config.config.registration,
         group_rating=config.config.groups,
         exam=ext.is_exam_active(),
         student=student,
         highlight=config.config.highlight_syntax,
         page=page,
-        pagination=pagination,
     )
 
 
@@ -418,6 +405,7 @@ def change_password():
 @blueprint.errorhandler(Exception)
 def handle_view_errors(e):
     print(get_exception_info())
+    db.context.end(failed=True)
     return render_template("error.jinja", redirect="/")
 
 
@@ -2,7 +2,6 @@ import datetime
 
 from flask_jwt_extended import unset_jwt_cookies
 from flask_jwt_extended.exceptions import JWTExtendedException
-from flask_paginate import Pagination
 from jwt.exceptions import PyJWTError
 
 from flask import Blueprint
@@ -20,12 +19,13 @@ from webapp.managers import (
 )
 from webapp.models import Message, Student, TypeOfTask
 from webapp.repositories import AppDatabase
-from webapp.utils import authorize, get_exception_info
+from webapp.utils import authorize, get_exception_info, unit_of_work
 
 
 blueprint = Blueprint("teacher", __name__)
 config = AppConfigManager(lambda: app.config)
 db = AppDatabase(lambda: config.config.connection_string)
+unit_of_work(blueprint, db)
 
 ext = ExternalTaskManager(db.groups, db.tasks)
 students = StudentManager(config, db.students, db.mailers)
@@ -35,36 +35,22 @@ statuses = StatusManager(db.tasks, db.groups, db.variants, db.statuses, config,
 exports = ExportManager(db.groups, db.messages, statuses, db.statuses, db.variants, db.tasks, db.students, students)
 
 
-@blueprint.route("/teacher/submissions/group/<int:gid>/variant/<int:vid>/task/<int:tid>",
-                 methods=["GET"], defaults={'page': 0})
-@blueprint.route("/teacher/submissions/group/<int:gid>/variant/<int:vid>/task/<int:tid>/<int:page>", methods=["GET"])
+@blueprint.route("/teacher/submissions/group/<int:gid>/variant/<int:vid>/task/<int:tid>", methods=["GET"])
 @authorize(db.students, lambda s: s.teacher)
-def teacher_submissions(teacher: Student, gid: int, vid: int, tid: int, page: int):
-    size = 5
-    submissions_statuses = statuses.get_submissions_statuses_by_info(gid, vid, tid, (page - 1) * size, size)
-    if not submissions_statuses and page > 0:
-        return redirect(f"/teacher/submissions/group/{gid}/variant/{vid}/task/{tid}/{page - 1}")
-    submissions_count = statuses.count_submissions_by_info(gid, vid, tid)
-    pagination = Pagination(
-        page=page,
-        per_page=size,
-        total=submissions_count,
-        search=False,
-        prev_label="<",
-        next_label=">",
-        inner_window=2,
-        outer_window=0,
-        css_framework="bootstrap5",
-    )
+def teacher_submissions(teacher: Student, gid: int, vid: int, tid: int):
+    after = request.args.get("after", type=int)
+    before = request.args.get("before", type=int)
+    page = statuses.get_submissions_statuses_by_info(gid, vid, tid, 5, after, before)
+    if not page.submissions and (after is not None or before is not None):
+        return redirect(f"/teacher/submissions/group/{gid}/variant/{vid}/task/{tid}")
     return render_template(
         "teacher/submissions.jinja",
-        submissions=submissions_statuses,
+        submissions=page.submissions,
         highlight=config.config.highlight_syntax,
         registration=config.config.registration,
         group_rating=config.config.groups,
         page=page,
         info=(gid, vid, tid),
-        pagination=pagination,
         student=teacher,
     )
 
@@ -100,8 +86,24 @@ def verify_block(teacher: Student, gid: int, vid: int, tid: int):
     if not config.config.readonly:
         _, block = db.tasks.get_by_id_with_block(tid)
         if block:
-            for task in db.tasks.get_all_in_block(block.id):
-                db.statuses.verify(task.id, vid, gid, teacher.id)
+            tasks = [task.id for task in db.tasks.get_all_in_block(block.id)]
+            db.statuses.verify_many(tasks, [vid], gid, teacher.id)
+    return redirect(f'/group/{gid}')
+
+
+@blueprint.route("/teacher/verify-block/many", methods=["POST"])
+@authorize(db.students, lambda s: s.teacher)
+def verify_block_many(teacher: Student):
+    gid = request.form.get("gid", type=int)
+    block = request.form.get("block", type=int)
+    if gid is None or all(item.id != gid for item in db.groups.get_all()):
+        return render_template("error.jinja", redirect="/teacher"), 400
+    if block is None or all(item.id != block for item in db.tasks.get_blocks()):
+        return render_template("error.jinja", redirect="/teacher"), 400
+    if not config.config.readonly:
+        tasks = [task.id for task in db.tasks.get_all_in_block(block)]
+        variants = request.form.getlist("variants", type=int)
+        db.statuses.verify_many(tasks, variants, gid, teacher.id)
     return redirect(f'/group/{gid}')
 
 
@@ -112,6 +114,7 @@ def dashboard(teacher: Student):
     glist = db.groups.get_all()
     vlist = db.variants.get_all()
     tlist = db.tasks.get_all()
+    blist = db.tasks.get_blocks()
     ips = db.ips.list_allowed()
     return render_template(
         "teacher/dashboard.jinja",
@@ -124,6 +127,7 @@ def dashboard(teacher: Student):
         glist=glist,
         vlist=vlist,
         tlist=tlist,
+        blist=blist,
         ips=ips,
     )
 
@@ -384,6 +388,7 @@ def update_student(teacher: Student, id: int):
 @blueprint.errorhandler(Exception)
 def handle_view_errors(e):
     print(get_exception_info())
+    db.context.end(failed=True)
     return render_template("error.jinja", redirect="/")
 
 
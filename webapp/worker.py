@@ -1,30 +1,279 @@
+import datetime
+import hashlib
+import importlib
+import json
+import os
+import select
+import signal
+import socket
 import sys
+import tempfile
 import time
-from multiprocessing import Process
+from collections import deque
+from collections.abc import Iterable, Iterator
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection, wait
 
-from webapp.dto import AppConfig
+from webapp.dto import AppConfig, ExternalTaskDto
 from webapp.managers import ExternalTaskManager
-from webapp.repositories import AppDatabase
+from webapp.models import Message, MessageCheck, engines, hash_code
+from webapp.repositories import ANALYSIS_CHANNEL, PENDING_CHANNEL, AppDatabase
 from webapp.utils import get_exception_info
 
 
-def check_solution(
-    core_path: str,
-    group_title: str,
-    task: int,
-    variant: int,
-    code: str
-):
-    if core_path not in sys.path:
-        sys.path.insert(1, core_path)
-    from check_solution import check_solution
-    (ok, error) = check_solution(
-        group=group_title,
-        task=task,
-        variant=variant,
-        code=code,
-    )
-    return (ok, error)
+POLL_INTERVAL = 5
+MAX_POLL_INTERVAL = 60
+SIGNAL_INTERVAL = 0.1
+SANDBOX_INTERVAL = 0.005
+VERSION_CHECK_INTERVAL = 30
+ANALYSIS_RETRY_DELAY = 60
+ANALYSIS_MAX_ATTEMPTS = 5
+TIME_LIMIT_EXCEEDED = "Превышено ограничение по времени выполнения ({} с)."
+MEMORY_LIMIT_EXCEEDED = "Превышено ограничение по памяти ({} МиБ)."
+SOLUTION_CRASHED = "Проверка аварийно завершилась: {}."
+
+
+def load_core(core_path: str):
+    if core_path in sys.path:
+        sys.path.remove(core_path)
+    sys.path.insert(1, core_path)
+    root = os.path.join(os.path.abspath(core_path), "")
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if name == "check_solution" or path and os.path.abspath(path).startswith(root):
+            del sys.modules[name]
+    importlib.invalidate_caches()
+    return importlib.import_module("check_solution")
+
+
+def limit_resources(time_limit: int, memory_limit: int):
+    import resource
+    if time_limit:
+        resource.setrlimit(resource.RLIMIT_CPU, (time_limit, time_limit + 1))
+    if memory_limit:
+        memory = memory_limit * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+
+
+def run_check(config: AppConfig, core, group_title: str, task: int, variant: int, code: str) -> list:
+    try:
+        (ok, output) = core.check_solution(group=group_title, task=task, variant=variant, code=code)
+        return ["verdict", ok, output]
+    except MemoryError:
+        return ["limit", MEMORY_LIMIT_EXCEEDED.format(config.check_memory_limit)]
+    except BaseException:
+        return ["error", get_exception_info()]
+
+
+def parse_verdict(data: str) -> tuple[bool, str | None, bool]:
+    try:
+        verdict = json.loads(data)
+    except ValueError:
+        verdict = None
+    match verdict:
+        case ["verdict", bool() as ok, str() | None as output]:
+            return ok, output, True
+        case ["limit", str() as output]:
+            return False, output, False
+        case ["error", str() as error]:
+            raise RuntimeError(error)
+    return False, SOLUTION_CRASHED.format("некорректный вердикт"), False
+
+
+def wait_sandboxed(child: int, alive: int, time_limit: int) -> int | None:
+    deadline = time.monotonic() + time_limit if time_limit else None
+    closed = False
+    with os.fdopen(alive, "rb", buffering=0) as stream:
+        while True:
+            if closed:
+                pid, status = os.waitpid(child, os.WNOHANG)
+                if pid:
+                    break
+            timeout = None if deadline is None else deadline - time.monotonic()
+            if timeout is not None and timeout <= 0:
+                os.kill(child, signal.SIGKILL)
+                os.waitpid(child, 0)
+                return None
+            if closed:
+                time.sleep(SANDBOX_INTERVAL if timeout is None else min(SANDBOX_INTERVAL, timeout))
+            elif select.select([stream], [], [], timeout)[0] and not stream.read(65536):
+                closed = True
+    if os.WIFSIGNALED(status) and os.WTERMSIG(status) == signal.SIGXCPU:
+        return None
+    return status
+
+
+def check_sandboxed(config: AppConfig, core, group_title: str, task: int, variant: int,
+                    code: str) -> tuple[bool, str | None, bool]:
+    if not hasattr(os, "fork"):
+        return parse_verdict(json.dumps(run_check(config, core, group_title, task, variant, code)))
+    with tempfile.TemporaryDirectory(prefix="check-") as directory:
+        path = os.path.join(directory, "verdict.json")
+        alive, exited = os.pipe()
+        child = os.fork()
+        if child == 0:
+            os.closerange(3, exited)
+            os.closerange(exited + 1, os.sysconf("SC_OPEN_MAX"))
+            try:
+                limit_resources(config.check_time_limit, config.check_memory_limit)
+                verdict = run_check(config, core, group_title, task, variant, code)
+                with open(path, "w", encoding="utf-8") as stream:
+                    json.dump(verdict, stream)
+            finally:
+                os._exit(0)
+        os.close(exited)
+        status = wait_sandboxed(child, alive, config.check_time_limit)
+        if status is None:
+            return False, TIME_LIMIT_EXCEEDED.format(config.check_time_limit), False
+        try:
+            with open(path, encoding="utf-8") as stream:
+                data = stream.read()
+        except FileNotFoundError:
+            reason = f"сигнал {os.WTERMSIG(status)}" if os.WIFSIGNALED(status) else f"код {os.WEXITSTATUS(status)}"
+            return False, SOLUTION_CRASHED.format(reason), False
+    return parse_verdict(data)
+
+
+def normalize_code(code: str) -> str:
+    return code.replace("\r\n", "\n").rstrip()
+
+
+def get_checker_version(config: AppConfig) -> str:
+    if config.checker_version:
+        return config.checker_version
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(config.core_path):
+        dirs[:] = sorted(name for name in dirs if not name.startswith(".") and name != "__pycache__")
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            digest.update(f"{os.path.relpath(path, config.core_path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def get_check_key(version: str, ext: ExternalTaskDto, code: str) -> tuple[str, int, int, str, str]:
+    return (ext.group_title, ext.task, ext.variant, hash_code(normalize_code(code)), version)
+
+
+def record_cached_check(config: AppConfig, db: AppDatabase, version: str, ext: ExternalTaskDto, code: str,
+                        ok: bool, error: str):
+    if config.enable_check_cache:
+        db.results.record(*get_check_key(version, ext, code), ok, error)
+
+
+def checker_process(config: AppConfig, connection: Connection, parent: int):
+    core = load_core(config.core_path)
+    prepared = set()
+    while True:
+        if not connection.poll(5):
+            if os.getppid() != parent:
+                return
+            continue
+        try:
+            request = connection.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        job, group_title, task, variant, code = request
+        try:
+            if task not in prepared and hasattr(core, "prepare"):
+                core.prepare(task)
+            prepared.add(task)
+            result = check_sandboxed(config, core, group_title, task, variant, code)
+            connection.send((job, result, None))
+        except BaseException:
+            connection.send((job, None, get_exception_info()))
+
+
+class Checker:
+    def __init__(self, config: AppConfig, version: str):
+        self.version = version
+        self.connection, child = Pipe()
+        self.process = Process(target=checker_process, args=(config, child, os.getpid()), daemon=True)
+        self.process.start()
+        child.close()
+        self.checks = 0
+        self.broken = False
+
+    def send(self, job: int, ext: ExternalTaskDto, code: str):
+        self.connection.send((job, ext.group_title, ext.task, ext.variant, code))
+
+    def receive(self, job: int) -> tuple[int, tuple[bool, str | None, bool] | None, str | None]:
+        self.checks += 1
+        try:
+            return self.connection.recv()
+        except (EOFError, OSError):
+            self.broken = True
+            return job, None, f"Checker process {self.process.pid} exited with code {self.process.exitcode}"
+
+    def close(self):
+        try:
+            self.connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.connection.close()
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+
+
+class CheckerPool:
+    def __init__(self, config: AppConfig, version: str = ""):
+        self.config = config
+        self.version = version
+        self.size = max(1, config.checker_concurrency)
+        self.recycle_after = config.checker_recycle_after
+        self.idle: list[Checker] = []
+
+    def run(self, jobs: Iterable[tuple[int, ExternalTaskDto, str]]):
+        pending = deque(jobs)
+        busy: dict[Connection, tuple[Checker, int]] = {}
+        try:
+            while pending or busy:
+                while pending and len(busy) < self.size:
+                    job, ext, code = pending.popleft()
+                    checker = self.idle.pop() if self.idle else Checker(self.config, self.version)
+                    busy[checker.connection] = (checker, job)
+                    checker.send(job, ext, code)
+                ready = wait(list(busy), 0)
+                if not ready:
+                    yield None
+                    ready = wait(list(busy))
+                for connection in ready:
+                    checker, job = busy.pop(connection)
+                    result = checker.receive(job)
+                    self.release(checker)
+                    yield result
+        finally:
+            for checker, _ in busy.values():
+                checker.close()
+
+    def warm(self):
+        while len(self.idle) < self.size:
+            self.idle.append(Checker(self.config, self.version))
+
+    def reload(self, version: str):
+        if version == self.version:
+            return
+        print(f"Reloading checkers for core version {version}")
+        self.version = version
+        stale, self.idle = self.idle, []
+        self.warm()
+        for checker in stale:
+            checker.close()
+
+    def release(self, checker: Checker):
+        recycle = self.recycle_after and checker.checks >= self.recycle_after
+        if not checker.broken and not recycle and checker.version == self.version:
+            self.idle.append(checker)
+        else:
+            checker.close()
+
+    def close(self):
+        while self.idle:
+            self.idle.pop().close()
 
 
 def load_config(core_path: str):
@@ -34,6 +283,15 @@ def load_config(core_path: str):
     return load_config()
 
 
+def load_blocks(core_path: str) -> list[dict]:
+    if core_path not in sys.path:
+        sys.path.insert(1, core_path)
+    import check_solution
+    if not hasattr(check_solution, 'load_blocks'):
+        return []
+    return check_solution.load_blocks()
+
+
 def analyze_solution(analytics_path: str, task: int, code: str):
     if analytics_path not in sys.path:
         sys.path.insert(1, analytics_path)
@@ -41,6 +299,15 @@ def analyze_solution(analytics_path: str, task: int, code: str):
     return analyze_solution(task, code)
 
 
+def analyze_solutions(analytics_path: str, task: int, codes: list[str]) -> list:
+    if analytics_path not in sys.path:
+        sys.path.insert(1, analytics_path)
+    import analyze_solution as analytics
+    if not hasattr(analytics, "analyze_solutions"):
+        return [analytics.analyze_solution(task, code) for code in codes]
+    return analytics.analyze_solutions(task, codes)
+
+
 def get_solution_title(order: int):
     if order == 0:
         return 'Самое популярное решение'
@@ -69,78 +336,330 @@ def get_analysis_result(result):
             return analyzed, payload, None
 
 
-def process_pending_messages(config: AppConfig, db: AppDatabase, external: ExternalTaskManager):
-    pending_messages = db.messages.get_pending_messages()
+def get_external_tasks(
+    config: AppConfig,
+    db: AppDatabase,
+    external: ExternalTaskManager,
+    messages: list[Message],
+) -> dict[int, ExternalTaskDto]:
+    targets = db.messages.get_targets([message.id for message in messages])
+    cache: dict[tuple, ExternalTaskDto] = dict()
+    tasks = dict()
+    for message in messages:
+        group, variant, task, seed = targets[message.id]
+        key = (group.id, task.id, variant.id, seed and (seed.seed, seed.active))
+        if key not in cache:
+            cache[key] = external.get_external_task(group, variant, task, seed, config)
+        tasks[message.id] = cache[key]
+    return tasks
+
+
+def check_pending_messages(
+    config: AppConfig,
+    db: AppDatabase,
+    version: str,
+    pool: CheckerPool,
+    checks: list[tuple[Message, ExternalTaskDto]],
+) -> Iterator[tuple[Message, ExternalTaskDto, tuple[bool, str] | None, bool] | None]:
+    keys = {message.id: get_check_key(version, ext, message.code) for message, ext in checks}
+    results = db.results.get_many(list(set(keys.values()))) if config.enable_check_cache else dict()
+    jobs = dict()
+    for message, ext in checks:
+        cached = results.get(keys[message.id])
+        if cached is not None:
+            print("Using cached check result")
+            yield message, ext, (cached.ok, cached.output), False
+            continue
+        jobs[message.id] = (message, ext)
+    for item in pool.run((job, ext, message.code) for job, (message, ext) in jobs.items()):
+        if item is None:
+            yield None
+            continue
+        job, result, error = item
+        message, ext = jobs[job]
+        if result is None:
+            print(f"Error occured while checking message {job}: {error}")
+            yield message, ext, None, False
+            continue
+        (ok, output, cacheable) = result
+        yield message, ext, (ok, output), cacheable
+
+
+def get_message_key(message: Message) -> tuple[int, int, int]:
+    return message.task, message.variant, message.group
+
+
+class ResultWriter:
+    def __init__(self, config: AppConfig, db: AppDatabase, version: str, worker: str):
+        self.config = config
+        self.db = db
+        self.version = version
+        self.worker = worker
+        self.size = max(1, config.group_commit_size)
+        self.pending: list[tuple[Message, ExternalTaskDto, bool, str, bool]] = []
+        self.failed: set[tuple[int, int, int]] = set()
+
+    def add(self, message: Message, ext: ExternalTaskDto, ok: bool, error: str, cacheable: bool):
+        if get_message_key(message) in self.failed:
+            self.release(message)
+            return
+        print(f"Check result: {ok}, {error}")
+        self.pending.append((message, ext, ok, error, cacheable))
+        if len(self.pending) >= self.size:
+            self.flush()
+
+    def release(self, message: Message):
+        self.failed.add(get_message_key(message))
+        self.db.messages.release(message.id, self.worker, POLL_INTERVAL)
+
+    def flush(self):
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+        try:
+            with self.db.unit_of_work():
+                for result in pending:
+                    self.write(*result)
+            return
+        except BaseException:
+            exception = get_exception_info()
+            print(f"Error occured while committing {len(pending)} results: {exception}")
+        for result in pending:
+            if get_message_key(result[0]) in self.failed:
+                self.release(result[0])
+                continue
+            try:
+                with self.db.unit_of_work():
+                    self.write(*result)
+            except BaseException:
+                exception = get_exception_info()
+                print(f"Error occured while committing the result of message {result[0].id}: {exception}")
+                self.release(result[0])
+
+    def write(self, message: Message, ext: ExternalTaskDto, ok: bool, error: str, cacheable: bool):
+        status = self.db.statuses.check(
+            task=message.task,
+            variant=message.variant,
+            group=message.group,
+            code=message.code,
+            ok=ok,
+            output=error,
+            ip=message.ip,
+        )
+        self.db.messages.mark_as_processed(message.id)
+        self.db.checks.record_check(message.id, status.status, error, analyze=ok)
+        if cacheable:
+            record_cached_check(self.config, self.db, self.version, ext, message.code, ok, error)
+
+
+def process_pending_messages(
+    config: AppConfig,
+    db: AppDatabase,
+    external: ExternalTaskManager,
+    version: str,
+    pool: CheckerPool,
+    worker: str,
+) -> int:
+    pending_messages = db.messages.claim_next(config.claim_batch_size, worker, config.claim_lease_seconds)
     message_count = len(pending_messages)
     if message_count == 0:
-        return
+        return 0
     print(f"Processing {message_count} incoming messages...")
+    checks = []
+    order: dict[tuple[int, int, int], deque[int]] = dict()
+    external_tasks = get_external_tasks(config, db, external, pending_messages)
     for message in pending_messages:
-        group = db.groups.get_by_id(message.group)
-        variant = db.variants.get_by_id(message.variant)
-        task = db.tasks.get_by_id(message.task)
-        seed = db.seeds.get_final_seed(group.id)
-        ext = external.get_external_task(group, variant, task, seed, config)
+        ext = external_tasks[message.id]
         print(f"g-{message.group}, t-{message.task}, v-{message.variant}")
         print(f"external: {ext.group_title}, t-{ext.task}, v-{ext.variant}")
+        checks.append((message, ext))
+        order.setdefault(get_message_key(message), deque()).append(message.id)
+    writer = ResultWriter(config, db, version, worker)
+    ready: dict[int, tuple[Message, ExternalTaskDto, tuple[bool, str] | None, bool]] = dict()
+    for item in check_pending_messages(config, db, version, pool, checks):
+        if item is None:
+            writer.flush()
+            continue
+        message, ext, result, cacheable = item
+        ready[message.id] = item
+        queue = order[get_message_key(message)]
+        while queue and queue[0] in ready:
+            message, ext, result, cacheable = ready.pop(queue.popleft())
+            try:
+                if result is None:
+                    writer.release(message)
+                    continue
+                writer.add(message, ext, *result, cacheable)
+            except BaseException:
+                exception = get_exception_info()
+                print(f"Error occured while checking for messages: {exception}")
+                writer.release(message)
+    writer.flush()
+    return message_count
+
+
+def analyze_batch(config: AppConfig, task: int, codes: list[str]) -> list:
+    results = analyze_solutions(config.analytics_path, task, codes)
+    if len(results) != len(codes):
+        raise ValueError(f"Expected {len(codes)} analysis results, got {len(results)}")
+    return results
+
+
+def analyze_single(config: AppConfig, task: int, code: str):
+    try:
+        return analyze_batch(config, task, [code])[0]
+    except BaseException:
+        exception = get_exception_info()
+        print(f"Error occured while analyzing a solution for task {task}: {exception}")
+        return None
+
+
+def analyze_pending_checks(config: AppConfig, db: AppDatabase, external: ExternalTaskManager) -> int:
+    pending_checks = db.checks.get_unanalyzed(config.analytics_batch_size)
+    if not pending_checks:
+        return 0
+    print(f"Analyzing {len(pending_checks)} accepted solutions...")
+    external_tasks = get_external_tasks(config, db, external, [message for _, message in pending_checks])
+    batches: dict[int, list[tuple[MessageCheck, Message]]] = dict()
+    for check, message in pending_checks:
+        batches.setdefault(external_tasks[message.id].task, []).append((check, message))
+    for task, batch in batches.items():
         try:
-            ok, error = check_solution(
-                core_path=config.core_path,
-                group_title=ext.group_title,
-                task=ext.task,
-                variant=ext.variant,
-                code=message.code,
-            )
-            print(f"Check result: {ok}, {error}")
-            status = db.statuses.check(
-                task=message.task,
-                variant=message.variant,
-                group=message.group,
-                code=message.code,
-                ok=ok,
-                output=error,
-                ip=message.ip,
-            )
-            db.messages.mark_as_processed(message.id)
-            check = db.checks.record_check(message.id, status.status, error)
-            if not ok:
-                continue
-            analyzed, order, report = get_analysis_result(analyze_solution(
-                analytics_path=config.analytics_path,
-                code=message.code,
-                task=ext.task,
-            ))
-            print(f'Analysis result: {analyzed}, {order}')
-            if not analyzed:
-                continue
-            db.checks.record_analytics(
-                check=check.id,
-                achievement=order,
-                output=report,
-            )
-            db.statuses.record_analytics(
-                task=message.task,
-                variant=message.variant,
-                group=message.group,
-                achievement=order,
-                output=report,
-            )
+            results = analyze_batch(config, task, [message.code for _, message in batch])
         except BaseException:
             exception = get_exception_info()
-            print(f"Error occured while checking for messages: {exception}")
+            print(f"Error occured while analyzing task {task}, retrying one by one: {exception}")
+            results = [analyze_single(config, task, message.code) for _, message in batch]
+        with db.unit_of_work():
+            for (check, message), result in zip(batch, results, strict=True):
+                if result is None:
+                    postpone_analysis(db, check)
+                    continue
+                analyzed, order, report = get_analysis_result(result)
+                if not analyzed:
+                    continue
+                db.checks.record_analytics(
+                    check=check.id,
+                    achievement=order,
+                    output=report,
+                )
+                db.statuses.record_analytics(
+                    task=message.task,
+                    variant=message.variant,
+                    group=message.group,
+                    achievement=order,
+                    output=report,
+                    code=message.code,
+                )
+            db.checks.mark_as_analyzed([check.id for (check, _), result in zip(batch, results) if result is not None])
+    return len(pending_checks)
+
+
+def postpone_analysis(db: AppDatabase, check: MessageCheck):
+    attempts = check.analysis_attempts + 1
+    if attempts >= ANALYSIS_MAX_ATTEMPTS:
+        print(f"Giving up on analyzing check {check.id} after {attempts} attempts")
+        db.checks.postpone_analysis(check.id, attempts, None)
+        return
+    delay = datetime.timedelta(seconds=ANALYSIS_RETRY_DELAY * 2 ** (attempts - 1))
+    db.checks.postpone_analysis(check.id, attempts, datetime.datetime.now() + delay)
+
+
+class PendingSignal:
+    def __init__(self, connection_string: str, channel: str = PENDING_CHANNEL):
+        engine = engines.get_engine(connection_string)
+        self.dialect = engine.dialect.name
+        self.connection = engine.raw_connection()
+        match self.dialect:
+            case "postgresql":
+                self.connection.driver_connection.autocommit = True
+                with self.connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {channel}")
+            case "sqlite":
+                self.version = self.get_data_version()
+
+    def reset(self):
+        if self.dialect == "sqlite":
+            self.version = self.get_data_version()
+
+    def get_data_version(self) -> int:
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("PRAGMA data_version")
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+    def wait(self, timeout: float) -> bool:
+        match self.dialect:
+            case "postgresql":
+                driver = self.connection.driver_connection
+                if not driver.notifies:
+                    select.select([driver], [], [], timeout)
+                    driver.poll()
+                signalled = bool(driver.notifies)
+                driver.notifies.clear()
+                return signalled
+            case "sqlite":
+                deadline = time.monotonic() + timeout
+                step = SIGNAL_INTERVAL * max(1, timeout / POLL_INTERVAL)
+                while time.monotonic() < deadline:
+                    version = self.get_data_version()
+                    if version != self.version:
+                        self.version = version
+                        return True
+                    time.sleep(step)
+                return False
+            case _:
+                time.sleep(timeout)
+                return False
+
+    def close(self):
+        self.connection.close()
 
 
 def background_worker(config: AppConfig):
     print(f"Starting background worker for database: {config.connection_string}")
+    engines.configure(config.sqlite_pragmas)
+    db = AppDatabase(lambda: config.connection_string)
+    ext = ExternalTaskManager(db.groups, db.tasks)
+    pool = CheckerPool(config, get_checker_version(config))
+    pool.warm()
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    pending = PendingSignal(config.connection_string)
+    interval = POLL_INTERVAL
+    version_checked = time.monotonic()
+    while True:
+        try:
+            if time.monotonic() - version_checked >= VERSION_CHECK_INTERVAL:
+                version_checked = time.monotonic()
+                pool.reload(get_checker_version(config))
+            pending.reset()
+            if process_pending_messages(config, db, ext, pool.version, pool, worker):
+                interval = POLL_INTERVAL
+                continue
+        except BaseException:
+            exception = get_exception_info()
+            print(f"Error occured inside the loop: {exception}")
+        if not pending.wait(interval):
+            interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+
+def background_analytics(config: AppConfig):
+    print(f"Starting background analytics for database: {config.connection_string}")
+    engines.configure(config.sqlite_pragmas)
     db = AppDatabase(lambda: config.connection_string)
     ext = ExternalTaskManager(db.groups, db.tasks)
+    pending = PendingSignal(config.connection_string, ANALYSIS_CHANNEL)
     while True:
         try:
-            process_pending_messages(config, db, ext)
+            pending.reset()
+            if analyze_pending_checks(config, db, ext):
+                continue
         except BaseException:
             exception = get_exception_info()
             print(f"Error occured inside the loop: {exception}")
-        time.sleep(5)
+        pending.wait(POLL_INTERVAL)
 
 
 def start_background_worker(config: AppConfig):
@@ -152,3 +671,14 @@ def start_background_worker(config: AppConfig):
         return process.pid
     except Exception as e:
         print(e)
+
+
+def start_background_analytics(config: AppConfig):
+    if config.no_background_worker:
+        return
+    process = Process(target=background_analytics, args=(config,))
+    try:
+        process.start()
+        return process.pid
+    except Exception as e:
+        print(e)